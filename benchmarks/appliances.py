@@ -0,0 +1,104 @@
+"""
+Appliance websocket benchmark: connect storms, round-trip latency and throughput.
+
+Registers N synthetic appliances, connects them all at once through the
+appliance router, then has each ping at a configurable rate. Reports:
+
+- connect storm: time until every appliance was connected,
+- p50/p99 round-trip latency of a ping (or batch of pings),
+- messages per second,
+- server memory per connection (when the server is started by this benchmark).
+
+Run from the repository root with e.g.:
+
+    python -m benchmarks.appliances --appliances 1000 --rate 1 --duration 30
+
+By default a single-worker server is started (`manage.py runworkers`); pass
+`--url` to benchmark an already running server instead.
+"""
+import argparse
+import subprocess
+import sys
+
+from benchmarks import loadgen
+from benchmarks.workers import wait_for_port
+
+
+def rss_bytes(pid):
+    """Resident memory of a process and its children, in bytes (Linux only)."""
+    total = 0
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    for p in pids:
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appliances', type=int, default=500, help="Number of appliances to connect.")
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="Pings per second per appliance (0: back-to-back).")
+    parser.add_argument('--batch', type=int, default=1, help="Pings per frame (sent as a batch message).")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to ping for.")
+    parser.add_argument('--connect-time', type=float, default=5.0,
+                        help="Seconds allowed for the fleet to connect before pinging starts.")
+    parser.add_argument('--clients', type=int, default=None, help="Number of load-generating processes.")
+    parser.add_argument('--workers', type=int, default=1, help="Server workers, if starting a server.")
+    parser.add_argument('--url', default=None, help="Benchmark a running server at this ws:// URL.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--consumer', default=loadgen.DEFAULT_CONSUMER)
+    args = parser.parse_args()
+
+    loadgen.setup_django()
+    uuids = loadgen.create_appliances(args.appliances, consumer=args.consumer)
+
+    server = None
+    if args.url is None:
+        server = subprocess.Popen([sys.executable, 'manage.py', 'runworkers', '--workers', str(args.workers),
+                                   '--port', str(args.port)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = args.url or f'ws://127.0.0.1:{args.port}'
+
+    try:
+        peak_rss = baseline_rss = None
+        if server is not None:
+            wait_for_port('127.0.0.1', args.port)
+            baseline_rss = peak_rss = rss_bytes(server.pid)
+
+        def sample():
+            nonlocal peak_rss
+            if server is not None:
+                peak_rss = max(peak_rss, rss_bytes(server.pid))
+
+        interval = 1.0 / args.rate if args.rate else 0.0
+        stats = loadgen.run(base_url, uuids, duration=args.duration, interval=interval, batch=args.batch,
+                            processes=args.clients, connect_time=args.connect_time, sample=sample)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        loadgen.delete_appliances(uuids)
+
+    print(f"appliances:       {stats['connected']} connected, {stats['failed']} failed")
+    print(f"connect storm:    {stats['connect_storm'] * 1000:.0f} ms")
+    print(f"round trip p50:   {stats['p50'] * 1000:.2f} ms")
+    print(f"round trip p99:   {stats['p99'] * 1000:.2f} ms")
+    print(f"throughput:       {stats['messages_per_second']:.0f} msgs/s")
+    if baseline_rss is not None and stats['connected']:
+        per_connection = (peak_rss - baseline_rss) / stats['connected']
+        print(f"server memory:    {peak_rss / 2 ** 20:.1f} MiB peak, {per_connection / 1024:.1f} KiB/connection")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Microbenchmark: appliance protocol codec vs. the json-hook MessageEncoder/MessageDecoder.
+
+Run from the repository root with:
+
+    python -m benchmarks.codec
+"""
+import os
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chezbob.bobolith.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from chezbob.appliances.protocol import codec  # noqa: E402
+from chezbob.appliances.protocol.messages import MessageEncoder, MessageDecoder, PingMessage  # noqa: E402
+
+NUMBER = 100_000
+
+
+def bench(label, fn, baseline=None):
+    best = min(timeit.repeat(fn, number=NUMBER, repeat=5))
+    per_op = best / NUMBER * 1e6
+    speedup = f"  ({baseline / best:.2f}x)" if baseline else ""
+    print(f"{label:<40} {per_op:8.3f} µs/op{speedup}")
+    return best
+
+
+def main():
+    msg = PingMessage(ping='765d2c49-5d0a-4f4f-a1b2-0694be5b2e48')
+    text = MessageEncoder.encode(msg)
+    data = text.encode('utf-8')
+
+    codecs = [('json', codec.MessageCodec(use_orjson=False))]
+    if codec.orjson is not None:
+        codecs.append(('orjson', codec.MessageCodec(use_orjson=True)))
+
+    print("encode")
+    baseline = bench("  MessageEncoder.encode", lambda: MessageEncoder.encode(msg))
+    for name, c in codecs:
+        bench(f"  MessageCodec[{name}].encode", lambda: c.encode(msg), baseline)
+        bench(f"  MessageCodec[{name}].encode_bytes", lambda: c.encode_bytes(msg), baseline)
+
+    print("decode")
+    baseline = bench("  MessageDecoder.decode", lambda: MessageDecoder.decode(text))
+    for name, c in codecs:
+        bench(f"  MessageCodec[{name}].decode (str)", lambda: c.decode(text), baseline)
+        bench(f"  MessageCodec[{name}].decode (bytes)", lambda: c.decode(data), baseline)
+
+
+if __name__ == '__main__':
+    main()
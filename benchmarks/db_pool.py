@@ -0,0 +1,72 @@
+"""
+Benchmark: database work on the appliance connect path, with and without pooling.
+
+Simulates appliances connecting with a cold consumer cache: for each, the
+consumer class is resolved and the appliance marked UP, on the bounded
+appliance database executor. This is run once with CONN_MAX_AGE = 0 (a new
+connection per task) and once with persistent connections (the executor acting
+as a connection pool), and the connect-to-UP latencies are compared.
+
+Connection setup is what pooling saves, so run this against the database you
+deploy with, e.g.:
+
+    DATABASE_URL=postgresql://user@localhost:5432/database python -m benchmarks.db_pool
+
+or through pgbouncer with DATABASE_PGBOUNCER=true.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import loadgen
+
+
+def connect_to_up(appliance_uuid):
+    from django.utils import timezone
+    from chezbob.appliances.models import Appliance
+
+    Appliance.objects.values_list('consumer').get(pk=appliance_uuid)
+    Appliance.objects.filter(pk=appliance_uuid).update(status=Appliance.STATUS_UP,
+                                                       last_connected_at=timezone.now())
+
+
+async def storm(uuids):
+    from chezbob.appliances.db import database_sync_to_async
+
+    async def one(appliance_uuid):
+        start = time.monotonic()
+        await database_sync_to_async(connect_to_up)(appliance_uuid)
+        return time.monotonic() - start
+
+    return sorted(await asyncio.gather(*(one(appliance_uuid) for appliance_uuid in uuids)))
+
+
+def run(uuids, conn_max_age):
+    from django.db import connections
+
+    # Every connection (in every thread) shares this settings dict.
+    connections.databases['default']['CONN_MAX_AGE'] = conn_max_age
+    return asyncio.new_event_loop().run_until_complete(storm(uuids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appliances', type=int, default=1000)
+    args = parser.parse_args()
+
+    loadgen.setup_django()
+    uuids = loadgen.create_appliances(args.appliances)
+    try:
+        print(f"{'mode':<12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'total (s)':>10}")
+        for mode, conn_max_age in (('unpooled', 0), ('pooled', 600)):
+            start = time.monotonic()
+            latencies = run(uuids, conn_max_age)
+            total = time.monotonic() - start
+            print(f"{mode:<12} {loadgen.percentile(latencies, 50) * 1000:>10.2f} "
+                  f"{loadgen.percentile(latencies, 99) * 1000:>10.2f} {total:>10.2f}")
+    finally:
+        loadgen.delete_appliances(uuids)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Load generation for appliance websocket servers.
+
+Registers synthetic `Appliance` rows and drives websocket connections to a
+running server, pinging as fast as the server answers (or at a fixed rate).
+The load is spread across several client processes so that the client is
+not the bottleneck.
+
+This module is shared by the other benchmarks; see e.g. `benchmarks/workers.py`.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+
+DEFAULT_CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+NAME_PREFIX = 'loadgen'
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chezbob.bobolith.settings')
+    import django
+    django.setup()
+
+
+# Synthetic Appliances
+# --------------------
+
+def create_appliances(count, consumer=DEFAULT_CONSUMER):
+    """Register `count` synthetic appliances and return their UUIDs (as strings)."""
+    from chezbob.appliances.models import Appliance
+    appliances = [Appliance(uuid=uuid.uuid4(), name=f'{NAME_PREFIX}-{i}-{uuid.uuid4().hex[:8]}', consumer=consumer)
+                  for i in range(count)]
+    Appliance.objects.bulk_create(appliances)
+    return [str(appliance.uuid) for appliance in appliances]
+
+
+def delete_appliances(uuids, batch_size=500):
+    """Remove the synthetic appliances `create_appliances` returned (and nothing else)."""
+    from chezbob.appliances.models import Appliance
+    for i in range(0, len(uuids), batch_size):
+        Appliance.objects.filter(uuid__in=uuids[i:i + batch_size]).delete()
+
+
+# Client
+# ------
+
+def ping_frame(payload: str) -> str:
+    return '{"header":{"msg_type":"ping","version":0},"ping":"%s"}' % payload
+
+
+def batch_frame(payloads) -> str:
+    return '{"header":{"msg_type":"batch","version":0},"messages":[%s]}' % ','.join(map(ping_frame, payloads))
+
+
+class _ClientStats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.messages = 0
+        self.last_connected_at = None
+        self.latencies = []
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+async def _drive(url, ping_at, stop_at, interval, batch, stats):
+    import websockets
+
+    async with websockets.connect(url, ping_interval=None, max_queue=None) as ws:
+        stats.connected += 1
+        stats.last_connected_at = time.monotonic()
+
+        # Wait for the whole fleet to connect before starting to ping.
+        await asyncio.sleep(max(0.0, ping_at - time.monotonic()))
+
+        while time.monotonic() < stop_at:
+            sent_at = time.monotonic()
+            if batch > 1:
+                await ws.send(batch_frame([str(sent_at)] * batch))
+            else:
+                await ws.send(ping_frame(str(sent_at)))
+            for _ in range(batch):
+                await ws.recv()
+            stats.latencies.append(time.monotonic() - sent_at)
+            stats.messages += batch
+            if interval:
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - sent_at)))
+
+
+async def _drive_all(urls, ping_at, stop_at, interval, batch):
+    stats = _ClientStats()
+    results = await asyncio.gather(*(_drive(url, ping_at, stop_at, interval, batch, stats) for url in urls),
+                                   return_exceptions=True)
+    stats.failed = sum(1 for result in results if isinstance(result, BaseException))
+    return stats.to_dict()
+
+
+def _client_process(args):
+    return asyncio.new_event_loop().run_until_complete(_drive_all(*args))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def run(base_url, uuids, duration=10.0, interval=0.0, batch=1, processes=None, connect_time=2.0,
+        sample=None):
+    """
+    Connect every appliance in `uuids` to the server at `base_url`, allowing
+    `connect_time` seconds for the whole fleet to connect. Then ping for
+    `duration` seconds: every `interval` seconds, or back-to-back if 0, sending `batch`
+    pings per frame. If given, `sample()` is called every 100ms while the
+    clients run (e.g. to measure server memory).
+
+    Returns the combined stats of all client processes.
+    """
+    processes = processes or max(1, multiprocessing.cpu_count() // 2)
+    urls = [f'{base_url}/appliances/ws/{appliance_uuid}/' for appliance_uuid in uuids]
+
+    started_at = time.monotonic()
+    ping_at = started_at + connect_time
+    stop_at = ping_at + duration
+    chunks = [(urls[i::processes], ping_at, stop_at, interval, batch) for i in range(processes)]
+
+    with multiprocessing.Pool(processes) as pool:
+        pending = pool.map_async(_client_process, chunks)
+        while not pending.ready():
+            if sample is not None:
+                sample()
+            pending.wait(0.1)
+        results = pending.get()
+
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    connected_at = [result['last_connected_at'] for result in results if result['last_connected_at']]
+    stats = {key: sum(result[key] for result in results) for key in ('connected', 'failed', 'messages')}
+    stats.update({
+        'connect_storm': (max(connected_at) - started_at) if connected_at else float('nan'),
+        'messages_per_second': stats['messages'] / duration,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+    })
+    return stats
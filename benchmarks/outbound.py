@@ -0,0 +1,75 @@
+"""
+Benchmark: memory held for appliances that have stopped reading.
+
+Simulates appliances whose connections are wedged (their outbound queues are
+paused, as they are once the heartbeat marks them unresponsive) while the
+server keeps sending to them, and compares the memory retained with that of
+an unbounded buffer (which is what handing every message to the server amounts to).
+
+Run from the repository root with:
+
+    python -m benchmarks.outbound [--appliances 1000] [--messages 1000] [--queue-size 100]
+"""
+import argparse
+import asyncio
+import os
+import tracemalloc
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chezbob.bobolith.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from chezbob.appliances.outbound import OutboundQueue, POLICIES  # noqa: E402
+from chezbob.appliances.protocol.messages import PingMessage  # noqa: E402
+
+
+async def send(msg):
+    pass
+
+
+async def unbounded(appliances, messages):
+    buffers = [[] for _ in range(appliances)]
+    for i in range(messages):
+        for buffer in buffers:
+            buffer.append(PingMessage(ping=str(i)))
+    return buffers
+
+
+async def bounded(appliances, messages, policy, maxsize):
+    queues = [OutboundQueue(send, maxsize=maxsize, policy=policy) for _ in range(appliances)]
+    for queue in queues:
+        queue.pause()
+    for i in range(messages):
+        for queue in queues:
+            await queue.send(PingMessage(ping=str(i)))
+    return queues
+
+
+def measure(coroutine):
+    tracemalloc.start()
+    retained = asyncio.get_event_loop().run_until_complete(coroutine)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del retained
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--appliances', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=1000, help="Messages sent to each appliance.")
+    parser.add_argument('--queue-size', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.appliances} stalled appliances, {args.messages} messages each")
+    current, peak = measure(unbounded(args.appliances, args.messages))
+    print(f"{'unbounded':<14} retained {current / 2 ** 20:8.1f} MiB, peak {peak / 2 ** 20:8.1f} MiB")
+    for policy in POLICIES:
+        current, peak = measure(bounded(args.appliances, args.messages, policy, args.queue_size))
+        print(f"{policy:<14} retained {current / 2 ** 20:8.1f} MiB, peak {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup benchmark: how long the ASGI application takes to import, and which
+modules account for the time (from `python -X importtime`).
+
+Run from the repository root with:
+
+    python -m benchmarks.startup [--runs 10] [--top 15] [--budget MS]
+
+By default the modules daphne itself imports (twisted, autobahn, ...) are
+excluded, since a worker has loaded them before it imports the application.
+Set BOBOLITH_PROFILE=production to measure the production profile.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+TARGET = 'chezbob.bobolith.asgi'
+
+
+def import_times(module, preload=None):
+    """
+    Import `module` in a fresh interpreter, returning
+    {module name: (self µs, cumulative µs)} as reported by -X importtime.
+    If given, `preload` is imported first and its modules aren't counted.
+    """
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'chezbob.bobolith.settings')
+    source = f'import {preload}; import {module}' if preload else f'import {module}'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', source],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.strip() == preload:
+            # Modules are listed as they finish importing, so all of the
+            # preloaded modules come before this line.
+            times.clear()
+            continue
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default=TARGET)
+    parser.add_argument('--preload', default='daphne.server',
+                        help="Module the server has already imported (not counted); '' for none.")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget', type=float, help="Exit with an error if the median exceeds this (ms).")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module, args.preload or None) for _ in range(args.runs)]
+    totals = [sum(self_us for self_us, _ in times.values()) / 1000 for times in runs]
+    median = statistics.median(totals)
+
+    print(f"profile: {os.environ.get('BOBOLITH_PROFILE', 'development')}")
+    preloaded = f" after {args.preload}" if args.preload else ""
+    print(f"import {args.module}{preloaded}: median {median:.1f} ms, min {min(totals):.1f} ms "
+          f"({len(runs[-1])} modules, {args.runs} runs)")
+
+    print(f"\n{'self ms':>9} {'cum. ms':>9}  top-level packages by self time")
+    packages = {}
+    for name, (self_us, _) in runs[-1].items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        cumulative_us = runs[-1].get(package, (0, 0))[1]
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {package}")
+
+    if args.budget is not None and median > args.budget:
+        print(f"\nover budget ({median:.1f} ms > {args.budget:.1f} ms)")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
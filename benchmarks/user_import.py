@@ -0,0 +1,90 @@
+"""
+Benchmark: creating users in bulk.
+
+Creates `--users` synthetic users with `import_users`, hashing their passwords
+in one process and in a pool of `--workers` processes, and compares them with
+creating a sample of users one at a time through `UserCreationForm` (as the
+admin does). The users are deleted afterwards. Run from the repository root with:
+
+    python -m benchmarks.user_import [--users 2000] [--workers 8]
+
+The hasher is whatever the settings profile selects; compare with
+`BOBOLITH_PROFILE=test`, which uses a fast hasher.
+"""
+import argparse
+import time
+import uuid
+
+from benchmarks import loadgen
+
+
+def records(count, prefix):
+    for i in range(count):
+        yield {
+            'username': f'{prefix}-{i}',
+            'first_name': 'Load',
+            'last_name': f'Generator {i}',
+            'nickname': f'{prefix} {i}',
+            'password': f'correct horse battery staple {i}',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--workers', type=int, help="Default: BOBOLITH_PASSWORD_HASH_WORKERS.")
+    parser.add_argument('--form-sample', type=int, default=20,
+                        help="Users to create through UserCreationForm, to estimate its rate.")
+    args = parser.parse_args()
+
+    loadgen.setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth.hashers import get_hasher
+
+    from chezbob.accounts.forms import UserCreationForm
+    from chezbob.accounts.models import User
+    from chezbob.accounts.passwords import hashing_pool, hashing_workers
+    from chezbob.accounts.provisioning import import_users
+
+    # Unique to this run, so that only the users created here are deleted.
+    prefix = f'{loadgen.NAME_PREFIX}-user-{uuid.uuid4().hex[:8]}'
+    form_records = list(records(args.form_sample, f'{prefix}-form'))
+    serial_records = list(records(args.users, f'{prefix}-serial'))
+    pool_records = list(records(args.users, f'{prefix}-pool'))
+    usernames = [record['username'] for record in form_records + serial_records + pool_records]
+
+    print(f"hasher: {get_hasher().algorithm}, profile: {settings.BOBOLITH_PROFILE}")
+    print(f"{'method':<32} {'users':>7} {'time (s)':>9} {'users/s':>9}")
+
+    def report(label, count, elapsed):
+        print(f"{label:<32} {count:>7} {elapsed:>9.2f} {count / elapsed:>9.1f}")
+
+    try:
+        start = time.monotonic()
+        for record in form_records:
+            form = UserCreationForm({**record, 'password1': record['password'], 'password2': record['password']})
+            form.save()
+        report("UserCreationForm", args.form_sample, time.monotonic() - start)
+
+        start = time.monotonic()
+        created, _ = import_users(serial_records)
+        report("import_users (1 process)", created, time.monotonic() - start)
+
+        workers = args.workers or hashing_workers()
+        pool = hashing_pool(workers)
+        try:
+            start = time.monotonic()
+            created, _ = import_users(pool_records, pool=pool)
+            label = f"import_users ({workers} processes)" if workers > 1 else "import_users (1 process, no pool)"
+            report(label, created, time.monotonic() - start)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    finally:
+        for i in range(0, len(usernames), 500):
+            User.objects.filter(username__in=usernames[i:i + 500]).delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Load test: connections and message throughput vs. number of ASGI workers.
+
+Starts `manage.py runworkers` with an increasing number of workers, connects
+a fleet of synthetic appliances to it, and reports ping/pong throughput for
+each worker count. Run from the repository root with:
+
+    python -m benchmarks.workers --workers 1 2 4 --appliances 200 --duration 10
+
+For anything beyond a single worker, configure a shared channel layer
+(REDIS_URL) as you would in production.
+"""
+import argparse
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import loadgen
+
+
+def wait_for_port(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not start listening on {host}:{port}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--appliances', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--clients', type=int, default=None, help="Number of load-generating processes.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    loadgen.setup_django()
+    uuids = loadgen.create_appliances(args.appliances)
+    base_url = f'ws://{args.host}:{args.port}'
+
+    print(f"{'workers':>8} {'connected':>10} {'failed':>7} {'msgs/s':>10} {'scaling':>8}")
+    baseline = None
+    try:
+        for workers in args.workers:
+            server = subprocess.Popen([sys.executable, 'manage.py', 'runworkers', '--workers', str(workers),
+                                       '--bind', args.host, '--port', str(args.port)],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(args.host, args.port)
+                stats = loadgen.run(base_url, uuids, duration=args.duration, processes=args.clients)
+            finally:
+                server.terminate()
+                server.wait()
+
+            rate = stats['messages_per_second']
+            baseline = baseline or rate / workers
+            print(f"{workers:>8} {stats['connected']:>10} {stats['failed']:>7} {rate:>10.0f} "
+                  f"{rate / baseline:>7.2f}x")
+    finally:
+        loadgen.delete_appliances(uuids)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,7 @@ class UserAdmin(BaseUserAdmin):
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         (_('Personal info'), {'fields': ('first_name', 'last_name', 'nickname', 'email')}),
-        (_('Chez Bob'), {'fields': ('is_fraudulent', 'notes')}),
+        (_('Chez Bob'), {'fields': ('barcode', 'is_fraudulent', 'notes')}),
         (_('Permissions'), {
             'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions'),
         }),
@@ -5,3 +5,14 @@ class AccountsAppConfig(AppConfig):
     name = 'chezbob.accounts'
     label = 'accounts'
     verbose_name = 'Accounts: Authentication & Authorization'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .changes import user_changes
+        from .lookup import user_index
+        from .middleware import session_user_cache
+        from .notifications import notify_appliances
+
+        user_changes.subscribe(user_index.apply)
+        user_changes.subscribe(session_user_cache.apply)
+        user_changes.subscribe(notify_appliances)
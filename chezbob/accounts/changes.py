@@ -0,0 +1,127 @@
+"""
+In-process change feed for users.
+
+Saving or deleting a `User` records a `UserChange` (which fields changed,
+taken from `update_fields`, and the user's current values). Changes are
+delivered to every subscriber synchronously, on the thread that made them, once
+the transaction commits. Within a request, changes are held and delivered
+together when the request finishes (see `.signals`), with at most one change
+per user; `user_changes.batch()` does the same for other code.
+
+Subscribe with `user_changes.subscribe(fn)`, where `fn` takes a list of
+`UserChange`s. Code that changes users in bulk (e.g. with `bulk_update`,
+which sends no signals) should call `user_changes.record_many` afterwards.
+
+Subscribers only see changes made in their own process. Changes made elsewhere
+(e.g. by management commands) reach running servers' kiosks only through a
+channel layer shared between processes (see `.notifications`), and servers'
+caches otherwise catch up when they expire.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# The fields whose values changes carry (i.e. not passwords and the like).
+FIELDS = ('username', 'nickname', 'barcode', 'first_name', 'last_name', 'email',
+          'is_active', 'is_staff', 'is_fraudulent')
+
+
+class UserChange(NamedTuple):
+    pk: int
+    # The fields that changed, or None if unknown (e.g. a save without update_fields).
+    fields: Optional[FrozenSet[str]]
+    # The user's values of `FIELDS` as of the change (empty if deleted).
+    values: Dict[str, object]
+    created: bool = False
+    deleted: bool = False
+
+    @classmethod
+    def from_user(cls, user, fields=None, created=False, deleted=False):
+        values = {} if deleted else {field: getattr(user, field) for field in FIELDS}
+        return cls(user.pk, frozenset(fields) if fields is not None else None, values, created, deleted)
+
+    def affects(self, fields: Iterable[str]) -> bool:
+        """Whether any of `fields` (may have) changed."""
+        return self.fields is None or self.deleted or not self.fields.isdisjoint(fields)
+
+    def merge(self, later: 'UserChange') -> 'UserChange':
+        """Combine this change with a later change to the same user."""
+        fields = None if self.fields is None or later.fields is None else self.fields | later.fields
+        return UserChange(self.pk, fields, later.values, self.created or later.created, later.deleted)
+
+
+class ChangeFeed:
+    """
+    Delivers changes to subscribers once committed, merged per batch.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[List[UserChange]], None]] = []
+        # Per thread: {pk: change} held until the end of the current batch, or None.
+        self._local = threading.local()
+
+    def subscribe(self, fn):
+        """Call `fn(changes)` with every batch of changes. Usable as a decorator."""
+        self._subscribers.append(fn)
+        return fn
+
+    def record(self, change: UserChange):
+        """Deliver a change once the current transaction (if any) commits."""
+        transaction.on_commit(lambda: self.record_many([change]))
+
+    def record_many(self, changes: Iterable[UserChange]):
+        """Deliver changes now, or at the end of the current batch."""
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            self._deliver(list(_merge({}, changes).values()))
+        else:
+            _merge(pending, changes)
+
+    def begin(self):
+        """Hold changes recorded on this thread until `flush`."""
+        # Deliver anything left over from a batch that was never flushed.
+        self.flush()
+        self._local.pending = {}
+
+    def flush(self):
+        """Deliver the changes held since `begin`, and stop holding them."""
+        pending, self._local.pending = getattr(self._local, 'pending', None), None
+        if pending:
+            self._deliver(list(pending.values()))
+
+    @contextmanager
+    def batch(self):
+        """Hold changes recorded in the block, and deliver them at its end."""
+        if getattr(self._local, 'pending', None) is not None:
+            # Already batching (e.g. in a request); the outer batch delivers them.
+            yield
+            return
+        self.begin()
+        try:
+            yield
+        finally:
+            self.flush()
+
+    def _deliver(self, changes: List[UserChange]):
+        if not changes:
+            return
+        for fn in self._subscribers:
+            try:
+                fn(changes)
+            except Exception:
+                logger.exception("User change subscriber %r failed.", fn)
+
+
+def _merge(pending: Dict[int, UserChange], changes: Iterable[UserChange]) -> Dict[int, UserChange]:
+    for change in changes:
+        earlier = pending.get(change.pk)
+        pending[change.pk] = change if earlier is None else earlier.merge(change)
+    return pending
+
+
+user_changes = ChangeFeed()
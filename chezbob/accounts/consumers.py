@@ -0,0 +1,44 @@
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.db import database_sync_to_async
+from chezbob.appliances.registry import register_consumer
+
+from .lookup import user_index, DEFAULT_LIMIT
+from .messages import UserLookupMessage, UserLookupResultMessage, UsersChangedMessage
+from .notifications import USERS_CHANGED_GROUP
+
+MAX_LIMIT = 50
+
+
+@register_consumer
+class UserLookupConsumer(ApplianceConsumer):
+    """
+    Consumer for point-of-sale appliances (kiosks), which look users up to log
+    them in by barcode or to autocomplete usernames. Lookups are answered from
+    the in-process user index (see `.lookup`), without querying the database,
+    and are told which users have changed (`UsersChangedMessage`).
+    """
+
+    async def join_groups(self):
+        await super().join_groups()
+        if self.channel_layer is not None:
+            await self.group_add(USERS_CHANGED_GROUP)
+
+    async def receive_user_lookup(self, lookup_msg: UserLookupMessage):
+        query = getattr(lookup_msg, 'query', None)
+        if not isinstance(query, str):
+            await self.receive_unhandled(lookup_msg)
+            return
+
+        limit = getattr(lookup_msg, 'limit', None)
+        if not isinstance(limit, int) or limit < 1:
+            limit = DEFAULT_LIMIT
+        fuzzy = getattr(lookup_msg, 'fuzzy', True)
+
+        if not user_index.is_fresh():
+            await database_sync_to_async(user_index.load)()
+        users = user_index.search(query, limit=min(limit, MAX_LIMIT), fuzzy=bool(fuzzy))
+
+        await self.send_json(UserLookupResultMessage(query=query, users=[user.to_json() for user in users]))
+
+    async def accounts_users_changed(self, event):
+        await self.send_json(UsersChangedMessage(users=event['users']))
@@ -0,0 +1,227 @@
+"""
+In-process index of users, for kiosks looking users up by username, nickname
+or barcode.
+
+Active users are loaded once into memory (`user_index`; when the ASGI server
+starts, or else on the first lookup), with:
+
+- an exact-match table of (case-folded) usernames, nicknames and barcodes,
+- a sorted list of usernames and nicknames, for prefix search by bisection,
+- a trigram index of usernames and nicknames, for fuzzy search,
+
+so that lookups never touch the database. The index is updated from the user
+change feed (see `.changes`), and otherwise reloaded after a TTL, which bounds
+staleness when users are changed by another process.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from django.conf import settings
+
+from .changes import UserChange
+from .models import User
+
+DEFAULT_TTL = 300
+
+# Changes to any other fields leave the index as it is.
+INDEXED_FIELDS = ('username', 'nickname', 'barcode', 'is_active')
+DEFAULT_LIMIT = 10
+FUZZY_THRESHOLD = 0.3
+FUZZY_MAX_POSTINGS = 100
+FUZZY_CANDIDATES = 50
+
+
+class UserEntry(NamedTuple):
+    pk: int
+    username: str
+    nickname: str
+    barcode: Optional[str]
+
+    def to_json(self):
+        return {'id': self.pk, 'username': self.username, 'nickname': self.nickname}
+
+
+def fold(s: str) -> str:
+    return s.casefold().strip()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class UserIndex:
+    """
+    Cached, searchable view of all active users.
+    """
+
+    def __init__(self, queryset, ttl=None):
+        self.queryset = queryset
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._users: Dict[int, UserEntry] = None
+        self._expires_at = 0.0
+        # folded username/nickname/barcode -> {pk}
+        self._exact: Dict[str, Set[int]] = {}
+        # sorted [(folded username/nickname, pk)]
+        self._sorted: List[tuple] = []
+        # trigram -> {folded username/nickname}
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def __len__(self):
+        return len(self._users or ())
+
+    def get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'BOBOLITH_USER_INDEX_TTL', DEFAULT_TTL)
+
+    def is_fresh(self):
+        return self._users is not None and self._expires_at > time.monotonic()
+
+    def load(self):
+        """(Re)load the index from the database. This is synchronous."""
+        entries = [UserEntry(*row) for row in self.queryset
+                   .filter(is_active=True)
+                   .values_list('pk', 'username', 'nickname', 'barcode')
+                   .iterator()]
+
+        with self._lock:
+            self._users = {}
+            self._exact = defaultdict(set)
+            self._sorted = []
+            self._trigrams = defaultdict(set)
+            for entry in entries:
+                self._add(entry, sort=False)
+            self._sorted.sort()
+            self._expires_at = time.monotonic() + self.get_ttl()
+
+    def invalidate(self):
+        with self._lock:
+            self._users = None
+
+    def apply(self, changes: List[UserChange]):
+        """Apply a batch of user changes (see `.changes`)."""
+        with self._lock:
+            if self._users is None:
+                return
+            for change in changes:
+                if not change.affects(INDEXED_FIELDS):
+                    continue
+                self._remove(change.pk)
+                values = change.values
+                if not change.deleted and values['is_active']:
+                    self._add(UserEntry(change.pk, values['username'], values['nickname'], values['barcode']))
+
+    # Searching
+    # ---------
+
+    def lookup(self, identifier: str) -> List[UserEntry]:
+        """
+        Return the users whose username, nickname or barcode is `identifier` (ignoring case).
+        May hit the database if the index is stale; check `is_fresh()` first from async code.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            return self._entries(self._exact.get(fold(identifier), ()))
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, fuzzy: bool = True) -> List[UserEntry]:
+        """
+        Return up to `limit` users matching `query`: exact matches first, then
+        users whose username or nickname starts with it, then (if `fuzzy`)
+        users whose username or nickname is similar to it.
+        May hit the database if the index is stale; check `is_fresh()` first from async code.
+        """
+        self._ensure_loaded()
+        query = fold(query)
+        if not query:
+            return []
+
+        with self._lock:
+            found = dict.fromkeys(sorted(self._exact.get(query, ())))
+
+            i = bisect_left(self._sorted, (query,))
+            while len(found) < limit and i < len(self._sorted) and self._sorted[i][0].startswith(query):
+                found.setdefault(self._sorted[i][1])
+                i += 1
+
+            if fuzzy and len(found) < limit:
+                for key in self._similar(query):
+                    for pk in sorted(self._exact.get(key, ())):
+                        found.setdefault(pk)
+
+            return self._entries(list(found)[:limit])
+
+    def _similar(self, query):
+        """Folded usernames/nicknames similar to `query`, most similar first."""
+        query_trigrams = trigrams(query)
+
+        # Candidates share the query's rarer trigrams; trigrams common to many
+        # keys are slow to count and say little about similarity.
+        shared = Counter()
+        for trigram in query_trigrams:
+            keys = self._trigrams.get(trigram, ())
+            if len(keys) <= FUZZY_MAX_POSTINGS:
+                shared.update(keys)
+
+        scored = []
+        for key, _ in shared.most_common(FUZZY_CANDIDATES):
+            key_trigrams = trigrams(key)
+            similarity = len(query_trigrams & key_trigrams) / len(query_trigrams | key_trigrams)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((-similarity, key))
+        return [key for _, key in sorted(scored)]
+
+    # Maintenance
+    # -----------
+
+    def _ensure_loaded(self):
+        if not self.is_fresh():
+            self.load()
+
+    def _entries(self, pks):
+        return [self._users[pk] for pk in pks if pk in self._users]
+
+    def _keys(self, entry: UserEntry):
+        """The folded keys an entry is found by: (searchable keys, exact-only keys)."""
+        searchable = {fold(entry.username), fold(entry.nickname)} - {''}
+        exact_only = {fold(entry.barcode)} - searchable - {''} if entry.barcode else set()
+        return searchable, exact_only
+
+    def _add(self, entry: UserEntry, sort=True):
+        self._users[entry.pk] = entry
+        searchable, exact_only = self._keys(entry)
+        for key in searchable | exact_only:
+            self._exact[key].add(entry.pk)
+        for key in searchable:
+            if sort:
+                insort(self._sorted, (key, entry.pk))
+            else:
+                self._sorted.append((key, entry.pk))
+            for trigram in trigrams(key):
+                self._trigrams[trigram].add(key)
+
+    def _remove(self, pk: int):
+        entry = self._users.pop(pk, None)
+        if entry is None:
+            return
+        searchable, exact_only = self._keys(entry)
+        for key in searchable | exact_only:
+            self._exact[key].discard(pk)
+            if self._exact[key]:
+                continue
+            del self._exact[key]
+            if key in searchable:
+                for trigram in trigrams(key):
+                    self._trigrams[trigram].discard(key)
+        for key in searchable:
+            i = bisect_left(self._sorted, (key, pk))
+            if i < len(self._sorted) and self._sorted[i] == (key, pk):
+                del self._sorted[i]
+
+
+user_index = UserIndex(User.objects.all())
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from chezbob.appliances.provisioning import FORMATS, DEFAULT_BATCH_SIZE, guess_format, write_records
+
+from ...provisioning import EXPORT_FIELDS, export_users
+
+
+class Command(BaseCommand):
+    help = "Export all users (including is_fraudulent and notes) as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help="Output file (default: stdout).")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: guessed from the output file extension, or csv).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, output, format, chunk_size, **options):
+        if format is None:
+            format = 'csv' if output == '-' else guess_format(output)
+
+        records = export_users(chunk_size)
+        if output == '-':
+            write_records(self.stdout, format, EXPORT_FIELDS, records)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                write_records(f, format, EXPORT_FIELDS, records)
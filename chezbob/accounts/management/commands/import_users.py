@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from chezbob.appliances.provisioning import (FORMATS, DEFAULT_BATCH_SIZE, ProvisioningError,
+                                              guess_format, open_records, read_records)
+
+from ...passwords import hashing_pool
+from ...provisioning import import_users
+
+
+class Command(BaseCommand):
+    help = "Create users from CSV or JSON Lines, hashing their passwords in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('users',
+                            help="Users file (username, email, first_name, last_name, nickname, barcode, "
+                                 "password), or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: guessed from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int,
+                            help="Processes to hash passwords in (default: BOBOLITH_PASSWORD_HASH_WORKERS).")
+        parser.add_argument('--skip-existing', action='store_true',
+                            help="Skip users whose username exists, rather than failing.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and roll back.")
+
+    def handle(self, *args, users, format, batch_size, workers, skip_existing, dry_run, **options):
+        pool = hashing_pool(workers)
+        try:
+            with transaction.atomic():
+                with open_records(users) as f:
+                    created, skipped = import_users(read_records(f, format or guess_format(users)),
+                                                    batch_size=batch_size, pool=pool,
+                                                    skip_existing=skip_existing)
+                self.stdout.write(f"Users: {created} created, {skipped} skipped.")
+
+                if dry_run:
+                    transaction.set_rollback(True)
+                    self.stdout.write("Dry run: rolled back.")
+        except (ProvisioningError, IntegrityError, OSError) as e:
+            raise CommandError(str(e))
+        finally:
+            if pool is not None:
+                pool.shutdown()
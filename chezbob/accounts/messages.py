@@ -0,0 +1,35 @@
+"""
+Appliance protocol messages for looking users up (see `.consumers`).
+"""
+from chezbob.appliances.protocol.messages import message_mixin
+
+
+class UserLookupMessage(message_mixin('user_lookup')):
+    """
+    Look users up by username, nickname or barcode. `limit` and `fuzzy` are optional.
+    """
+    __slots__ = ['query', 'limit', 'fuzzy']
+
+    query: str
+    limit: int
+    fuzzy: bool
+
+
+class UserLookupResultMessage(message_mixin('user_lookup_result')):
+    """
+    The users matching a `UserLookupMessage`'s query, best match first.
+    """
+    __slots__ = ['query', 'users']
+
+    query: str
+    users: list
+
+
+class UsersChangedMessage(message_mixin('users_changed')):
+    """
+    Sent to kiosks when users they may have looked up change: a list of
+    `{'id': ..., 'fields': [...] (or null if unknown), 'deleted': ...}`.
+    """
+    __slots__ = ['users']
+
+    users: list
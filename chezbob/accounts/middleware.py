@@ -0,0 +1,152 @@
+"""
+Websocket authentication, for use in place of channels' `AuthMiddlewareStack`.
+
+Channels resolves the session and loads the user (two queries, on a worker
+thread) for every websocket that connects. Appliances authenticate by UUID
+and never look at the user, so that work is wasted, and it is multiplied in
+reconnect storms. `AuthMiddleware` here:
+
+- skips resolving the user entirely for consumers that don't need it (those
+  with `needs_user = False`, such as appliance consumers); `scope['user']` is
+  then anonymous, and
+- otherwise caches the user of each session for a few seconds
+  (`BOBOLITH_WEBSOCKET_USER_CACHE_TTL`), dropping entries when the user changes
+  (see `.changes`) or logs out.
+
+`scope['session']` is created without touching the database, and only loaded
+if a consumer uses it.
+
+Because websockets are authenticated by the session cookie, `OriginValidator`
+denies websockets opened by pages on other sites.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from importlib import import_module
+
+from channels.auth import get_user, UserLazyObject
+from channels.security.websocket import OriginValidator as BaseOriginValidator
+from channels.sessions import CookieMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http.request import split_domain_port, validate_host
+
+DEFAULT_TTL = 10.0
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class SessionUserCache:
+    """
+    Maps session keys to users, with a TTL and a maximum size.
+    """
+
+    def __init__(self, ttl=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Entries are dropped from other threads (see `.signals`).
+        self._lock = threading.Lock()
+        # session key -> (user, expires_at), oldest first
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'BOBOLITH_WEBSOCKET_USER_CACHE_TTL', DEFAULT_TTL)
+
+    def get(self, session_key):
+        with self._lock:
+            entry = self._entries.get(session_key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[session_key]
+                return None
+            return entry[0]
+
+    def set(self, session_key, user):
+        with self._lock:
+            self._entries.pop(session_key, None)
+            self._entries[session_key] = (user, time.monotonic() + self.get_ttl())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, session_key):
+        with self._lock:
+            self._entries.pop(session_key, None)
+
+    def discard_users(self, pks):
+        with self._lock:
+            for session_key, (user, _) in list(self._entries.items()):
+                if user.pk is not None and user.pk in pks:
+                    del self._entries[session_key]
+
+    def apply(self, changes):
+        """User change subscriber (see `.changes`): drop the sessions of changed users."""
+        self.discard_users({change.pk for change in changes})
+
+
+session_user_cache = SessionUserCache()
+
+
+class AuthMiddleware:
+    """
+    Populates `scope['session']` and `scope['user']`, for consumers that need them.
+    Requires `CookieMiddleware` above it.
+    """
+
+    def __init__(self, inner, cache: SessionUserCache = None):
+        self.inner = inner
+        self.cache = cache if cache is not None else session_user_cache
+        self.session_store = import_module(settings.SESSION_ENGINE).SessionStore
+
+    def __call__(self, scope):
+        scope = dict(scope)
+        session_key = scope['cookies'].get(settings.SESSION_COOKIE_NAME)
+        scope['session'] = self.session_store(session_key)
+        scope['user'] = UserLazyObject()
+
+        inner_instance = self.inner(scope)
+        if not getattr(inner_instance, 'needs_user', True):
+            scope['user']._wrapped = AnonymousUser()
+            return inner_instance
+        return partial(self.coroutine_call, inner_instance, scope, session_key)
+
+    async def coroutine_call(self, inner_instance, scope, session_key, receive, send):
+        if not session_key:
+            user = AnonymousUser()
+        else:
+            user = self.cache.get(session_key)
+            if user is None:
+                user = await get_user(scope)
+                self.cache.set(session_key, user)
+        scope['user']._wrapped = user
+        await inner_instance(receive, send)
+
+
+class OriginValidator(BaseOriginValidator):
+    """
+    Denies websockets whose Origin is not in `ALLOWED_HOSTS`, like channels'
+    `AllowedHostsOriginValidator`, but allows those without an Origin header:
+    browsers always send one, and appliances don't.
+    """
+
+    def __init__(self, application):
+        super().__init__(application, allowed_origins=None)
+
+    def valid_origin(self, parsed_origin):
+        if parsed_origin is None:
+            return True
+        allowed_hosts = settings.ALLOWED_HOSTS
+        if settings.DEBUG and not allowed_hosts:
+            allowed_hosts = ['localhost', '127.0.0.1', '[::1]']
+        domain, _ = split_domain_port(parsed_origin.netloc)
+        return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+def AuthMiddlewareStack(inner):
+    return CookieMiddleware(AuthMiddleware(inner))
+
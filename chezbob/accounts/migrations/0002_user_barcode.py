@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='barcode',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='barcode'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='nickname',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='nickname'),
+        ),
+    ]
@@ -1,8 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import Group as DjangoGroup
 from django.db import models
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
 
@@ -15,7 +13,10 @@ class User(AbstractUser):
     first_name = models.CharField(_('first name'), max_length=30)
     last_name = models.CharField(_('last name'), max_length=150)
 
-    nickname = models.CharField(_('nickname'), max_length=255)
+    nickname = models.CharField(_('nickname'), max_length=255, db_index=True)
+
+    # e.g. the barcode on a user's card, for logging in at kiosks.
+    barcode = models.CharField(_('barcode'), max_length=64, unique=True, null=True, blank=True)
 
     is_fraudulent = models.BooleanField(_('fraudulent'), default=False)
 
@@ -32,8 +33,3 @@ class User(AbstractUser):
 class Group(DjangoGroup):
     class Meta:
         proxy = True
-
-
-@receiver(post_save, sender=User, dispatch_uid="foo")
-def test(sender, instance, **kwargs):
-    print(f"UPDATE_FIELDS: {kwargs.get('update_fields', None)}")
@@ -0,0 +1,35 @@
+"""
+Tells connected kiosks (see `.consumers.UserLookupConsumer`) which users have
+changed, through the channel layer.
+
+Kiosks are only told about changes made in other processes (e.g. by
+`manage.py import_users`, or by another server worker) if the channel layer is
+shared between processes (set REDIS_URL). With the default in-memory layer,
+only kiosks connected to the process that made a change are told about it.
+"""
+from typing import List
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .changes import UserChange
+from .lookup import INDEXED_FIELDS
+
+# Channel-layer group of the kiosks to tell about changed users.
+USERS_CHANGED_GROUP = 'accounts.users_changed'
+
+
+def notify_appliances(changes: List[UserChange]):
+    """User change subscriber (see `.changes`): tell connected kiosks which users changed."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    users = [{'id': change.pk,
+              'fields': sorted(change.fields) if change.fields is not None else None,
+              'deleted': change.deleted}
+             for change in changes if change.affects(INDEXED_FIELDS)]
+    if users:
+        async_to_sync(channel_layer.group_send)(USERS_CHANGED_GROUP, {
+            'type': 'accounts.users_changed',
+            'users': users,
+        })
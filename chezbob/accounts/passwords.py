@@ -0,0 +1,62 @@
+"""
+Password hashing for creating users in bulk.
+
+Hashing dominates the cost of creating a user: with the default hasher
+(PBKDF2), it takes tens to hundreds of milliseconds a password. For imports of
+thousands of users, `hash_passwords` hashes across a pool of processes
+(`hashing_pool`), one per CPU by default (`BOBOLITH_PASSWORD_HASH_WORKERS`).
+
+Tests and benchmarks can use the `test` settings profile, which swaps in a
+fast (and insecure) hasher.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Passwords sent to a worker at a time; hashing each takes long enough that this is mostly about balancing.
+CHUNKSIZE = 16
+
+
+def _init_worker():
+    # Workers that aren't forked from a set-up process (e.g. on macOS) must set up Django themselves.
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def hashing_workers() -> int:
+    workers = getattr(settings, 'BOBOLITH_PASSWORD_HASH_WORKERS', 0)
+    return workers or os.cpu_count() or 1
+
+
+def hashing_pool(workers: int = None) -> Optional[ProcessPoolExecutor]:
+    """
+    A process pool to hash passwords in, or None to hash them in this process
+    (with a single worker). The caller shuts it down.
+    """
+    workers = workers or hashing_workers()
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def hash_passwords(passwords: List[Optional[str]], pool: ProcessPoolExecutor = None) -> List[str]:
+    """
+    Hash passwords as `make_password` does (None gives an unusable password),
+    in `pool` if given.
+    """
+    if pool is None:
+        return [make_password(password) for password in passwords]
+
+    hashed = [None] * len(passwords)
+    usable = [i for i, password in enumerate(passwords) if password is not None]
+    for i, encoded in zip(usable, pool.map(make_password, [passwords[i] for i in usable], chunksize=CHUNKSIZE)):
+        hashed[i] = encoded
+    for i, password in enumerate(passwords):
+        if password is None:
+            hashed[i] = make_password(None)
+    return hashed
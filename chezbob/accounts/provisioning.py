@@ -0,0 +1,109 @@
+"""
+Bulk import and export of users.
+
+Records are read as CSV or JSON Lines (see `chezbob.appliances.provisioning`),
+with fields `username`, `email`, `first_name`, `last_name`, `nickname`,
+`barcode` and `password` (leave it empty for an unusable password).
+
+Imports are applied in batches: each batch is validated (passwords with
+`AUTH_PASSWORD_VALIDATORS`), hashed (across a process pool, see `.passwords`)
+and inserted with `bulk_create`. Exports (of `EXPORT_FIELDS`, for reconciliation
+with accounting) iterate over the database in chunks. See the `import_users`
+and `export_users` management commands, and the `export-users` view.
+"""
+from typing import Dict, Iterable, Set
+
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from chezbob.appliances.provisioning import DEFAULT_BATCH_SIZE, ProvisioningError, batched
+
+from .changes import UserChange, user_changes
+from .models import User
+from .passwords import hash_passwords
+
+EXPORT_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'nickname', 'barcode',
+                 'is_active', 'is_staff', 'is_superuser', 'is_fraudulent', 'date_joined', 'last_login', 'notes')
+
+
+def _user(record: Dict[str, str], record_number: int):
+    """Build an (unsaved, password-less) user from a record. Returns (user, password)."""
+    username = User.normalize_username((record.get('username') or '').strip())
+    if not username:
+        raise ProvisioningError(f"Record {record_number}: missing username.")
+    try:
+        User.username_validator(username)
+    except ValidationError as e:
+        raise ProvisioningError(f"Record {record_number}: invalid username {username!r}: {' '.join(e.messages)}")
+
+    user = User(
+        username=username,
+        email=User.objects.normalize_email((record.get('email') or '').strip()),
+        first_name=(record.get('first_name') or '').strip(),
+        last_name=(record.get('last_name') or '').strip(),
+        nickname=(record.get('nickname') or '').strip(),
+        barcode=(record.get('barcode') or '').strip() or None,
+    )
+
+    password = record.get('password') or None
+    if password is not None:
+        try:
+            password_validation.validate_password(password, user)
+        except ValidationError as e:
+            raise ProvisioningError(f"Record {record_number}: password for {username!r} rejected: "
+                                    f"{' '.join(e.messages)}")
+    return user, password
+
+
+def import_users(records: Iterable[Dict[str, str]], batch_size=DEFAULT_BATCH_SIZE, pool=None,
+                 skip_existing=False):
+    """
+    Create users from records, hashing passwords in `pool` (see `.passwords.hashing_pool`).
+    Returns (created, skipped). Existing usernames are an error unless `skip_existing`.
+    """
+    created = skipped = 0
+    record_number = 0
+    seen: Set[str] = set()
+
+    for batch in batched(records, batch_size):
+        users, passwords = [], []
+        for record in batch:
+            record_number += 1
+            user, password = _user(record, record_number)
+            if user.username in seen:
+                raise ProvisioningError(f"Record {record_number}: duplicate username {user.username!r}.")
+            seen.add(user.username)
+            users.append(user)
+            passwords.append(password)
+
+        existing = set(User.objects.filter(username__in=[user.username for user in users])
+                       .values_list('username', flat=True))
+        if existing and not skip_existing:
+            raise ProvisioningError(f"Users already exist: {', '.join(sorted(existing))}.")
+        if existing:
+            new = [i for i, user in enumerate(users) if user.username not in existing]
+            users, passwords = [users[i] for i in new], [passwords[i] for i in new]
+            skipped += len(existing)
+
+        for user, encoded in zip(users, hash_passwords(passwords, pool=pool)):
+            user.password = encoded
+        User.objects.bulk_create(users)
+        created += len(users)
+
+        # Not every database returns the primary keys of bulk-created rows.
+        if users and users[0].pk is None:
+            pks = dict(User.objects.filter(username__in=[user.username for user in users])
+                       .values_list('username', 'pk'))
+            for user in users:
+                user.pk = pks[user.username]
+
+        # `bulk_create` sends no signals; record the changes they would have.
+        changes = [UserChange.from_user(user, created=True) for user in users]
+        transaction.on_commit(lambda changes=changes: user_changes.record_many(changes))
+
+    return created, skipped
+
+
+def export_users(chunk_size=DEFAULT_BATCH_SIZE):
+    return User.objects.order_by('pk').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
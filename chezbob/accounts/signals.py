@@ -0,0 +1,36 @@
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import request_started, request_finished
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .changes import UserChange, user_changes
+from .middleware import session_user_cache
+from .models import User
+
+
+@receiver(post_save, sender=User, dispatch_uid='accounts.record_user_saved')
+def record_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    user_changes.record(UserChange.from_user(instance, update_fields, created=created))
+
+
+@receiver(post_delete, sender=User, dispatch_uid='accounts.record_user_deleted')
+def record_user_deleted(sender, instance, **kwargs):
+    user_changes.record(UserChange.from_user(instance, deleted=True))
+
+
+@receiver(request_started, dispatch_uid='accounts.begin_user_changes')
+def begin_user_changes(sender, **kwargs):
+    # Deliver the user changes a request makes together, when it finishes.
+    user_changes.begin()
+
+
+@receiver(request_finished, dispatch_uid='accounts.flush_user_changes')
+def flush_user_changes(sender, **kwargs):
+    user_changes.flush()
+
+
+@receiver(user_logged_out, dispatch_uid='accounts.discard_session_user')
+def discard_session_user(sender, request=None, **kwargs):
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        session_user_cache.discard(session.session_key)
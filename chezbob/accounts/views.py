@@ -0,0 +1,18 @@
+from django.contrib.auth.decorators import permission_required
+from django.http import HttpResponseBadRequest
+
+from chezbob.appliances.provisioning import FORMATS, export_response
+
+from . import provisioning
+
+
+@permission_required('accounts.view_user', raise_exception=True)
+def export_users(request):
+    """
+    Stream all users as CSV or JSON Lines (`?format=csv|jsonl`), as
+    `manage.py export_users` does.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(f"Unknown format {fmt!r}; expected one of {FORMATS}.")
+    return export_response(fmt, provisioning.EXPORT_FIELDS, provisioning.export_users(), 'users')
@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.contrib.admin import AdminSite
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
 
 from .models import Appliance, ApplianceLink
 
@@ -21,10 +24,38 @@ class ApplianceAdmin(admin.ModelAdmin):
         'status_icon',
         'last_connected_at',
         'last_heartbeat_at')
+    list_filter = ('status',)
+    search_fields = ('name', 'consumer')
+
+    # Don't COUNT(*) the whole table on every (filtered) changelist page.
+    show_full_result_count = False
+
+    def get_urls(self):
+        return [
+            path('status/',
+                 self.admin_site.admin_view(self.status_dashboard_view),
+                 name='appliances_appliance_status'),
+        ] + super().get_urls()
+
+    def status_dashboard_view(self, request):
+        """A read-only, live view of appliance status, fed by `status_feed.StatusFeedConsumer`."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Appliance status',
+        }
+        return TemplateResponse(request, 'admin/appliances/appliance/status_dashboard.html', context)
 
 
 class ApplianceLinkAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('key', 'src_appliance', 'dst_appliance')
+    list_select_related = ('src_appliance', 'dst_appliance')
+    search_fields = ('key', 'src_appliance__name', 'dst_appliance__name')
+    raw_id_fields = ('src_appliance', 'dst_appliance')
+
+    show_full_result_count = False
 
 
 def register_default(admin_site: AdminSite):
@@ -5,3 +5,12 @@ class AppliancesAppConfig(AppConfig):
     name = 'chezbob.appliances'
     label = 'appliances'
     verbose_name = 'Appliances'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import consumers, signals  # noqa: F401
+        from .registry import consumer_registry
+
+        if getattr(settings, 'BOBOLITH_APPLIANCE_PRELOAD_CONSUMERS', True):
+            consumer_registry.preload()
@@ -0,0 +1,67 @@
+"""
+Outbound message coalescing for appliance connections.
+
+Appliances that send or receive bursts of small messages can opt in to having
+outbound messages coalesced into `BatchMessage`s: messages are buffered and
+sent as a single frame once `max_messages` have accumulated or `max_delay`
+seconds have passed since the first buffered message, whichever is first.
+"""
+import asyncio
+import logging
+
+from .protocol.messages import BatchMessage
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundCoalescer:
+    """
+    Buffers outbound messages for one connection and flushes them as batches.
+    """
+
+    def __init__(self, send, max_messages: int, max_delay: float):
+        # `send` is a coroutine function that sends one message (or batch) as a frame.
+        self._send = send
+        self.max_messages = max_messages
+        self.max_delay = max_delay
+
+        self._buffer = []
+        self._timer = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    async def add(self, msg):
+        self._buffer.append(msg)
+        if len(self._buffer) >= self.max_messages:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.max_delay, self._flush_later)
+
+    async def flush(self):
+        """Send everything buffered, as a single message if there's only one."""
+        self._cancel_timer()
+        if not self._buffer:
+            return
+        buffer, self._buffer = self._buffer, []
+        await self._send(buffer[0] if len(buffer) == 1 else BatchMessage(messages=buffer))
+
+    def cancel(self):
+        """Drop everything buffered (e.g. because the connection has gone away)."""
+        self._cancel_timer()
+        self._buffer = []
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_later(self):
+        self._timer = None
+        asyncio.ensure_future(self._flush_logged())
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to flush outbound message batch.")
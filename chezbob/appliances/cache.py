@@ -0,0 +1,135 @@
+"""
+In-process cache of appliance UUID -> consumer class.
+
+Resolving the consumer class for an appliance involves a database query and a
+lookup in the consumer registry (see `.registry`). Neither is needed more than
+once per appliance while its row does not change, so the router looks consumer
+classes up here instead.
+
+When an ASGI server starts (see `chezbob.bobolith.asgi`), `consumer_cache.load()`
+fills the cache for every appliance in one query, so that a reconnect storm
+after a restart is served from memory. Lookups that fail (e.g. for unknown UUIDs) are
+cached too, for a shorter TTL, so that repeated bogus connects don't each hit
+the database.
+
+Entries are invalidated explicitly (via the `post_save`/`post_delete` signals
+on `Appliance`, see `.signals`) and expire after a TTL, which bounds staleness
+when the row is changed by another process.
+"""
+import importlib
+import time
+from uuid import UUID
+
+from django.conf import settings
+
+from .models import Appliance
+from .registry import ConsumerRegistry, consumer_registry, import_consumer  # noqa: F401
+
+DEFAULT_TTL = 300
+DEFAULT_MISS_TTL = 10
+
+
+class ConsumerClassCache:
+    """
+    Maps appliance UUIDs to consumer classes, with TTL and explicit invalidation.
+    """
+
+    def __init__(self, queryset, ttl=None, miss_ttl=None, registry: ConsumerRegistry = None):
+        self.queryset = queryset
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.registry = registry if registry is not None else consumer_registry
+        # uuid -> (klass or ValueError, expires_at)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hot_reload(self):
+        """Whether to bypass the cache entirely; only ever enabled in DEBUG."""
+        return settings.DEBUG and getattr(settings, 'BOBOLITH_APPLIANCE_HOT_RELOAD', False)
+
+    def get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'BOBOLITH_APPLIANCE_CONSUMER_CACHE_TTL', DEFAULT_TTL)
+
+    def get_miss_ttl(self):
+        if self.miss_ttl is not None:
+            return self.miss_ttl
+        return getattr(settings, 'BOBOLITH_APPLIANCE_CONSUMER_MISS_TTL', DEFAULT_MISS_TTL)
+
+    def load(self):
+        """Cache the consumer class of every appliance, in one query. This is synchronous."""
+        expires_at = time.monotonic() + self.get_ttl()
+        entries = {}
+        for uuid, consumer_path in self.queryset.values_list('pk', 'consumer').iterator():
+            try:
+                entries[uuid] = (self._load(uuid, consumer_path), expires_at)
+            except ValueError:
+                # Reported by the registry's preload; looked up (and cached as a miss) on connect.
+                pass
+        self._entries.update(entries)
+
+    def get_cached(self, uuid):
+        """
+        Return the cached consumer class for the appliance with the given UUID,
+        or None if it must be looked up (with `get`). This never hits the database.
+        Raises `ValueError` if the last lookup failed.
+        """
+        if self.hot_reload:
+            return None
+        entry = self._entries.get(UUID(str(uuid)))
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        if isinstance(entry[0], ValueError):
+            raise entry[0]
+        return entry[0]
+
+    def get(self, uuid):
+        """
+        Return the consumer class for the appliance with the given UUID.
+        Raises `ValueError` if there is no such appliance or its consumer cannot be imported.
+        May hit the database; use `get_cached` first from async code.
+        """
+        klass = self.get_cached(uuid)
+        if klass is not None:
+            return klass
+
+        uuid = UUID(str(uuid))
+        try:
+            klass = self._resolve(uuid)
+        except ValueError as e:
+            self._entries[uuid] = (e, time.monotonic() + self.get_miss_ttl())
+            raise
+        self._entries[uuid] = (klass, time.monotonic() + self.get_ttl())
+        return klass
+
+    def invalidate(self, uuid=None):
+        """Drop the entry for one appliance, or every entry if no UUID is given."""
+        if uuid is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(UUID(str(uuid)), None)
+
+    def _resolve(self, uuid):
+        try:
+            [consumer_path] = self.queryset.values_list('consumer').get(pk=uuid)
+        except Appliance.DoesNotExist:
+            raise ValueError(f"No appliance found for UUID {uuid}.")
+        return self._load(uuid, consumer_path)
+
+    def _load(self, uuid, consumer_path):
+        try:
+            if self.hot_reload:
+                # Ensure we have the most recent version of the consumer module.
+                importlib.invalidate_caches()
+                return import_consumer(consumer_path)
+            return self.registry.get(consumer_path)
+        except (ImportError, TypeError) as e:
+            raise ValueError(f"Consumer {consumer_path} could not be loaded "
+                             f"for appliance with UUID {uuid}: {e}")
+
+
+consumer_cache = ConsumerClassCache(Appliance.objects.all())
@@ -1,79 +1,326 @@
+import asyncio
 import logging
-from abc import ABCMeta
+import time
+from time import perf_counter
+from uuid import UUID
 
-from channels.generic.websocket import JsonWebsocketConsumer
-from django.utils import timezone
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
 
+from .batching import OutboundCoalescer
+from .db import database_sync_to_async
+from .dispatch import DispatchMeta
+from .heartbeat import heartbeat_scheduler
+from .links import link_graph, appliance_group, link_group
+from .metrics import metrics, message_type
 from .models import Appliance
-from .protocol.messages import MessageEncoder, MessageDecoder, PingMessage, PongMessage
+from .outbound import OutboundQueue, DEFAULT_MAXSIZE, DEFAULT_WINDOW, DROP_OLDEST
+from .protocol.codec import default_codec, negotiate, decode_content, MessageCodec
+from .protocol.messages import PingMessage, PongMessage, BatchMessage
+from .registry import register_consumer
+from .status_feed import publish_status
+from .tracker import status_tracker
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Payload prefix of the pings that ask an appliance to acknowledge outbound messages.
+OUTBOUND_PROBE_PREFIX = 'outbound:'
 
-class ApplianceConsumer(JsonWebsocketConsumer, metaclass=ABCMeta):
+
+class ApplianceConsumer(AsyncJsonWebsocketConsumer, metaclass=DispatchMeta):
+    """
+    Base consumer for appliances.
+
+    Websocket I/O happens on the event loop. Status changes and heartbeats are
+    recorded in memory by the status tracker and written to the database in
+    batches (see `.tracker`), so they never block the consumer.
+
+    Liveness is driven by the process-wide heartbeat scheduler (see `.heartbeat`),
+    which pings quiet appliances and calls `status_unresponsive`/`status_down`.
+
+    Incoming messages are dispatched through a table built when the class is
+    created (see `.dispatch`): define `receive_<msg_type>` or decorate a method
+    with `@handles(SomeMessage)` to handle a message type. Messages of types the
+    consumer does not handle are rejected before being decoded into objects.
+
+    Incoming `BatchMessage`s are unpacked and each message handled in order.
+    Consumers whose appliances understand batches may set
+    `outbound_batch_max_messages` > 1 to coalesce outbound messages as well.
+
+    Outbound messages go through a bounded queue (see `.outbound`), which is
+    paused while the appliance is unresponsive. Consumers whose appliances echo
+    `outbound:<n>` pings may set `outbound_window` > 0 to also stop sending once
+    that many messages are unacknowledged. `outbound_queue_size`,
+    `outbound_queue_policy` and `outbound_window` override the site-wide settings.
+
+    If a channel layer is configured, each consumer joins its appliance's group
+    and the groups of its incoming links (see `.links`); `send_link` sends a
+    message to every appliance linked from this one with a given key.
+    """
     appliance_uuid: str
+    codec: MessageCodec = default_codec
+
+    # Appliances are identified by UUID, so don't resolve a user for them
+    # (see `chezbob.accounts.middleware`); `scope['user']` is anonymous.
+    needs_user = False
+
+    # Outbound coalescing; disabled unless max_messages > 1.
+    outbound_batch_max_messages: int = 1
+    outbound_batch_max_delay: float = 0.005
+
+    # Outbound queueing; see `.outbound`. None means use the settings.
+    outbound_queue_size: int = None
+    outbound_queue_policy: str = None
+    outbound_window: int = None
 
     @classmethod
-    def encode_json(cls, content):
-        return MessageEncoder.encode(content)
+    async def encode_json(cls, content):
+        return default_codec.encode(content)
 
     @classmethod
-    def decode_json(cls, text_data):
-        return MessageDecoder.decode(text_data)
+    async def decode_json(cls, text_data):
+        return default_codec.decode(text_data, cls.accepted_msg_types)
 
     def __init__(self, scope):
         super().__init__(scope)
         kwargs = scope['url_route']['kwargs']
         self.appliance_uuid = kwargs['appliance_uuid']
+        self.groups_joined = set()
+        # Passed as `extra` to every log call about this appliance.
+        self.log_extra = {'appliance': str(self.appliance_uuid), 'consumer': type(self).__name__}
 
-    def connect(self):
-        logger.info(f"[{self.appliance_uuid}] Connecting...")
-        super().connect()
-        logger.info(f"[{self.appliance_uuid}] Connected!")
+        self.outbound_queue = OutboundQueue(
+            self.send_frame,
+            maxsize=self.outbound_queue_size or getattr(settings, 'BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_SIZE',
+                                                        DEFAULT_MAXSIZE),
+            policy=self.outbound_queue_policy or getattr(settings, 'BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_POLICY',
+                                                         DROP_OLDEST),
+            on_overflow=self.outbound_overflowed,
+            name=str(self.appliance_uuid),
+            window=(self.outbound_window if self.outbound_window is not None
+                    else getattr(settings, 'BOBOLITH_APPLIANCE_OUTBOUND_WINDOW', DEFAULT_WINDOW)),
+            probe=self.send_outbound_probe,
+            probe_interval=heartbeat_scheduler.ping_interval)
+
+        self.outbound = None
+        if self.outbound_batch_max_messages > 1:
+            self.outbound = OutboundCoalescer(self.outbound_queue.send,
+                                              max_messages=self.outbound_batch_max_messages,
+                                              max_delay=self.outbound_batch_max_delay)
+
+    async def websocket_connect(self, message):
+        if not metrics.enabled:
+            return await super().websocket_connect(message)
+        start = perf_counter()
+        await super().websocket_connect(message)
+        metrics.observe('connect', type(self).__name__, '', perf_counter() - start)
+
+    async def websocket_disconnect(self, message):
+        if not metrics.enabled:
+            return await super().websocket_disconnect(message)
+        start = perf_counter()
+        try:
+            await super().websocket_disconnect(message)
+        finally:
+            metrics.observe('disconnect', type(self).__name__, '', perf_counter() - start)
+
+    async def connect(self):
+        logger.info("Connecting...", extra=self.log_extra)
+        await super().connect()
+        logger.info("Connected!", extra=self.log_extra)
+        status_tracker.start()
+        heartbeat_scheduler.register(self)
         self.status_up()
+        await self.join_groups()
+
+    async def accept(self, subprotocol=None):
+        if subprotocol is None:
+            subprotocol, self.codec = negotiate(self.scope.get('subprotocols', ()))
+        await super().accept(subprotocol)
 
-    def disconnect(self, code):
-        logger.info(f"[{self.appliance_uuid}] Disconnected!")
-        super().disconnect(code)
+    async def disconnect(self, code):
+        logger.info("Disconnected!", extra=self.log_extra)
+        heartbeat_scheduler.unregister(self)
+        if self.outbound is not None:
+            self.outbound.cancel()
+        self.outbound_queue.cancel()
+        await self.group_discard(*self.groups_joined)
+        await super().disconnect(code)
         self.status_down()
 
-    def receive_json(self, msg, **kwargs):
-        if isinstance(msg, PingMessage):
-            self.receive_ping(msg)
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        heartbeat_scheduler.seen(self)
+        if not metrics.enabled:
+            await self.receive_json(await self.decode_frame(text_data, bytes_data), **kwargs)
+            return
+
+        start = perf_counter()
+        msg = await self.decode_frame(text_data, bytes_data)
+        decoded = perf_counter()
+        await self.receive_json(msg, **kwargs)
+        consumer, msg_type = type(self).__name__, message_type(msg)
+        metrics.observe('decode', consumer, msg_type, decoded - start)
+        metrics.observe('dispatch', consumer, msg_type, perf_counter() - decoded)
+
+    async def decode_frame(self, text_data=None, bytes_data=None):
+        if text_data is not None:
+            return await self.decode_json(text_data)
+        elif bytes_data is not None:
+            return self.codec.decode(bytes_data, self.accepted_msg_types)
+        else:
+            raise ValueError("No text or bytes section for incoming WebSocket frame!")
+
+    async def send_json(self, content, close=False):
+        if close:
+            if self.outbound is not None:
+                await self.outbound.flush()
+            await self.outbound_queue.flush()
+            await self.send_frame(content, close=close)
+        elif self.outbound is not None:
+            await self.outbound.add(content)
+        else:
+            await self.outbound_queue.send(content)
+
+    async def send_frame(self, content, close=False):
+        """Encode and send a single frame, bypassing outbound coalescing and queueing."""
+        if self.codec.binary:
+            await self.send(bytes_data=self.codec.encode_bytes(content), close=close)
+        else:
+            await super().send_json(content, close=close)
 
-    def receive_ping(self, ping_msg: PingMessage):
-        self.send_pong(ping_msg.ping)
+    async def receive_json(self, msg, **kwargs):
+        handler = self.message_handlers.get(type(msg))
+        if handler is None:
+            await self.receive_unhandled(msg)
+        elif metrics.enabled:
+            start = perf_counter()
+            await handler(self, msg)
+            metrics.observe('handler', type(self).__name__, message_type(msg), perf_counter() - start)
+        else:
+            await handler(self, msg)
 
-    def send_pong(self, content: str):
+    async def receive_unhandled(self, content):
+        logger.debug("Ignoring unhandled message: %r", content, extra=self.log_extra)
+
+    async def receive_batch(self, batch_msg: BatchMessage):
+        for msg in batch_msg.messages:
+            await self.receive_json(msg)
+
+    async def receive_ping(self, ping_msg: PingMessage):
+        status_tracker.heartbeat(self.appliance_uuid)
+        await self.send_pong(ping_msg.ping)
+
+    async def receive_pong(self, pong_msg: PongMessage):
+        status_tracker.heartbeat(self.appliance_uuid)
+        if isinstance(pong_msg.pong, str) and pong_msg.pong.startswith(OUTBOUND_PROBE_PREFIX):
+            try:
+                seq = int(pong_msg.pong[len(OUTBOUND_PROBE_PREFIX):])
+            except ValueError:
+                return
+            self.outbound_queue.acknowledge(seq)
+
+    async def send_ping(self, content: str = None):
+        if content is None:
+            content = str(time.time())
+        ping_msg = PingMessage(ping=content)
+        # Pings probe unresponsive appliances, so they skip the (then paused) queue.
+        await self.send_frame(ping_msg)
+
+    async def send_outbound_probe(self, seq: int):
+        """Ask the appliance to acknowledge the first `seq` outbound messages (see `.outbound`)."""
+        await self.send_ping(f'{OUTBOUND_PROBE_PREFIX}{seq}')
+
+    async def send_pong(self, content: str):
         pong_msg = PongMessage(pong=content)
-        self.send_json(pong_msg)
+        await self.send_json(pong_msg)
+
+    # Groups & Links
+    # --------------
+
+    async def join_groups(self):
+        """Join this appliance's group and the groups of its incoming links."""
+        if self.channel_layer is None:
+            return
+        if link_graph.is_fresh():
+            groups = link_graph.incoming_groups(self.appliance_uuid)
+        else:
+            groups = await database_sync_to_async(link_graph.incoming_groups)(self.appliance_uuid)
+        await self.group_add(appliance_group(self.appliance_uuid), *groups)
+
+    async def group_add(self, *groups):
+        for group in groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+            self.groups_joined.add(group)
+
+    async def group_discard(self, *groups):
+        for group in groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+            self.groups_joined.discard(group)
 
-    # Database Actions
-    # ----------------
+    async def send_link(self, key: str, msg):
+        """Send a message to every appliance linked from this one with the given key."""
+        await self.channel_layer.group_send(link_group(self.appliance_uuid, key), {
+            'type': 'appliance.link_message',
+            'src': str(self.appliance_uuid),
+            'key': key,
+            'content': MessageCodec.to_content(msg),
+        })
+
+    async def receive_link_message(self, src_uuid: UUID, key: str, msg):
+        """Handle a message from a linked appliance. By default, forward it to our appliance."""
+        await self.send_json(msg)
+
+    # Channel Layer Handlers
+    # ----------------------
+
+    async def appliance_link_message(self, event):
+        msg = decode_content(event['content'])
+        await self.receive_link_message(UUID(event['src']), event['key'], msg)
+
+    async def appliance_send(self, event):
+        # See `.remote.send_to_appliance`.
+        await self.send_json(decode_content(event['content']))
+
+    async def appliance_link_changed(self, event):
+        link_graph.invalidate()
+        await self.group_discard(*event['discard'])
+        await self.group_add(*event['add'])
+
+    # Status Actions
+    # --------------
 
     def status_up(self):
-        appliance = Appliance.objects.get(pk=self.appliance_uuid)
-        appliance.status_up()
-        appliance.last_connected_at = timezone.now()
-        appliance.save()
-        logger.info(f"Appliance UP {self.appliance_uuid}")
+        status_tracker.up(self.appliance_uuid)
+        logger.info("Appliance UP", extra=self.log_extra)
+        publish_status(self.appliance_uuid, Appliance.STATUS_UP)
+
+    def outbound_overflowed(self):
+        """Called when the outbound queue overflows with the `disconnect` policy."""
+        asyncio.ensure_future(self.close(code=1013))  # Try Again Later
+
+    def status_responsive(self):
+        self.outbound_queue.resume()
+        status_tracker.responsive(self.appliance_uuid)
+        logger.info("Appliance RESPONSIVE", extra=self.log_extra)
+        publish_status(self.appliance_uuid, Appliance.STATUS_UP)
 
     def status_unresponsive(self):
-        appliance = Appliance.objects.get(pk=self.appliance_uuid)
-        appliance.status_up()
-        appliance.save()
-        logger.info(f"Appliance UNRESPONSIVE {self.appliance_uuid}")
+        self.outbound_queue.pause()
+        status_tracker.unresponsive(self.appliance_uuid)
+        logger.info("Appliance UNRESPONSIVE", extra=self.log_extra)
+        publish_status(self.appliance_uuid, Appliance.STATUS_UNRESPONSIVE)
 
     def status_down(self):
-        appliance = Appliance.objects.get(pk=self.appliance_uuid)
-        appliance.status_down()
-        appliance.save()
-        logger.info(f"Appliance DOWN {self.appliance_uuid}")
+        status_tracker.down(self.appliance_uuid)
+        logger.info("Appliance DOWN", extra=self.log_extra)
+        publish_status(self.appliance_uuid, Appliance.STATUS_DOWN)
 
 
+@register_consumer
 class DummyConsumer(ApplianceConsumer):
 
-    def connect(self):
+    async def connect(self):
         print("CONNECTED!")
-        super().connect()
+        await super().connect()
+
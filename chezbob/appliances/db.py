@@ -0,0 +1,72 @@
+"""
+Database access for asynchronous appliance consumers.
+
+Appliance consumers live on the event loop, but the ORM is synchronous. Rather
+than handing database work to the (unbounded-by-connection) default executor,
+we run it on a small, dedicated thread pool so that the number of database
+connections held by a server process stays fixed no matter how many appliances
+are connected.
+
+With a non-zero `CONN_MAX_AGE`, each executor thread keeps its connection open
+between tasks, so the executor doubles as a per-process connection pool. A
+connection that has sat idle for longer than
+`BOBOLITH_APPLIANCE_DB_HEALTH_CHECK_INTERVAL` seconds is checked before it is
+reused, and replaced if the server has gone away.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+DEFAULT_DB_WORKERS = 4
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+
+_executor = None
+_local = threading.local()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide appliance database executor, creating it if necessary."""
+    global _executor
+    if _executor is None:
+        max_workers = getattr(settings, 'BOBOLITH_APPLIANCE_DB_WORKERS', DEFAULT_DB_WORKERS)
+        _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='appliance-db')
+    return _executor
+
+
+def _check_connection():
+    """Close this thread's connection if it has been idle for a while and is no longer usable."""
+    if connection.connection is None:
+        return
+    interval = getattr(settings, 'BOBOLITH_APPLIANCE_DB_HEALTH_CHECK_INTERVAL', DEFAULT_HEALTH_CHECK_INTERVAL)
+    last_used = getattr(_local, 'last_used', None)
+    if last_used is not None and time.monotonic() - last_used > interval and not connection.is_usable():
+        connection.close()
+
+
+def _run(func, *args, **kwargs):
+    close_old_connections()
+    _check_connection()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _local.last_used = time.monotonic()
+        close_old_connections()
+
+
+def database_sync_to_async(func):
+    """
+    Like `channels.db.database_sync_to_async`, but runs `func` on the bounded
+    appliance database executor.
+    """
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(get_executor(), partial(_run, func, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,59 @@
+"""
+Table-driven message dispatch for appliance consumers.
+
+When a consumer class is created, we build a table mapping each message class
+it handles to its handler. A method handles a message class if it is
+decorated with `@handles(SomeMessage)`, or (by convention) if it is named
+`receive_<msg_type>` for a registered message type. Dispatching a message is
+then a single dictionary lookup, however many message types the protocol has.
+
+The set of message types a consumer handles is also kept, so that frames of
+any other type can be rejected before a message object is built.
+"""
+from abc import ABCMeta
+
+from .protocol.messages import MESSAGE_TYPES, MessageHeader
+
+
+def handles(*message_classes):
+    """Mark a consumer method as the handler for the given message classes."""
+
+    def decorator(fn):
+        fn.handles_messages = message_classes
+        return fn
+
+    return decorator
+
+
+def build_dispatch_table(cls):
+    """Return the `{message class: handler function}` table for a consumer class."""
+    table = {}
+
+    # By convention: receive_<msg_type>.
+    for msg_type, message_class in MESSAGE_TYPES.items():
+        if message_class is MessageHeader:
+            continue
+        handler = getattr(cls, f'receive_{msg_type}', None)
+        if callable(handler):
+            table[message_class] = handler
+
+    # Explicitly decorated handlers take precedence; subclasses override their bases.
+    for klass in reversed(cls.__mro__):
+        for attr in vars(klass).values():
+            for message_class in getattr(attr, 'handles_messages', ()):
+                table[message_class] = attr
+
+    return table
+
+
+class DispatchMeta(ABCMeta):
+    """
+    Metaclass for appliance consumers: builds `message_handlers` and
+    `accepted_msg_types` when the class is created.
+    """
+
+    def __init__(cls, name, bases, namespace, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+        cls.message_handlers = build_dispatch_table(cls)
+        cls.accepted_msg_types = frozenset(MESSAGE_TYPES.inverse[message_class]
+                                           for message_class in cls.message_handlers)
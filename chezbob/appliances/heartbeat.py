@@ -0,0 +1,177 @@
+"""
+Server-side heartbeat scheduling for connected appliances.
+
+A single `HeartbeatScheduler` per process tracks when every connected appliance
+was last heard from. It pings appliances that have gone quiet, marks them
+UNRESPONSIVE after `unresponsive_timeout` seconds of silence, and marks them
+DOWN (closing the socket) after `down_timeout` seconds.
+
+Deadlines are kept in a hashed timer wheel: each tick only looks at the
+appliances whose deadline falls in the current slot, so the cost of a tick does
+not depend on how many appliances are connected. Hearing from an appliance only
+updates its last-seen time; its entry is lazily re-slotted when the old
+deadline comes around.
+"""
+import asyncio
+import logging
+import math
+import time
+
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICK = 1.0
+DEFAULT_PING_INTERVAL = 10.0
+DEFAULT_UNRESPONSIVE_TIMEOUT = 30.0
+DEFAULT_DOWN_TIMEOUT = 90.0
+
+
+class _Entry:
+    __slots__ = ['consumer', 'last_seen', 'unresponsive', 'due_tick']
+
+    def __init__(self, consumer, last_seen):
+        self.consumer = consumer
+        self.last_seen = last_seen
+        self.unresponsive = False
+        self.due_tick = None
+
+
+class HeartbeatScheduler:
+    """
+    Timer-wheel scheduler that drives appliance pings and the UNRESPONSIVE/DOWN states.
+    """
+
+    def __init__(self, tick=None, ping_interval=None, unresponsive_timeout=None, down_timeout=None):
+        self.tick = tick or getattr(settings, 'BOBOLITH_APPLIANCE_HEARTBEAT_TICK', DEFAULT_TICK)
+        self.ping_interval = ping_interval or \
+            getattr(settings, 'BOBOLITH_APPLIANCE_PING_INTERVAL', DEFAULT_PING_INTERVAL)
+        self.unresponsive_timeout = unresponsive_timeout or \
+            getattr(settings, 'BOBOLITH_APPLIANCE_UNRESPONSIVE_TIMEOUT', DEFAULT_UNRESPONSIVE_TIMEOUT)
+        self.down_timeout = down_timeout or \
+            getattr(settings, 'BOBOLITH_APPLIANCE_DOWN_TIMEOUT', DEFAULT_DOWN_TIMEOUT)
+
+        if not self.ping_interval < self.unresponsive_timeout < self.down_timeout:
+            raise ValueError("Heartbeat deadlines must satisfy "
+                             "ping_interval < unresponsive_timeout < down_timeout.")
+
+        # The wheel spans the longest deadline, so an entry is never more than one revolution ahead.
+        self._slots = [set() for _ in range(math.ceil(self.down_timeout / self.tick) + 1)]
+        self._entries = {}
+
+        self._epoch = None
+        self._current_tick = 0
+
+        self._task = None
+        self._loop = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Connection Tracking
+    # -------------------
+
+    def register(self, consumer):
+        """Start tracking a connected consumer. Also ensures the scheduler is running."""
+        self.start()
+        entry = _Entry(consumer, time.monotonic())
+        self._entries[consumer] = entry
+        self._schedule(entry, entry.last_seen + self.ping_interval)
+
+    def unregister(self, consumer):
+        """Stop tracking a consumer (e.g. because it disconnected)."""
+        entry = self._entries.pop(consumer, None)
+        if entry is not None and entry.due_tick is not None:
+            self._slots[entry.due_tick % len(self._slots)].discard(entry)
+
+    def seen(self, consumer):
+        """Record that we just heard from a consumer."""
+        entry = self._entries.get(consumer)
+        if entry is None:
+            return
+        entry.last_seen = time.monotonic()
+        if entry.unresponsive:
+            entry.unresponsive = False
+            consumer.status_responsive()
+
+    # Scheduling
+    # ----------
+
+    def _tick_for(self, t):
+        return max(math.ceil((t - self._epoch) / self.tick), self._current_tick + 1)
+
+    def _schedule(self, entry, t):
+        entry.due_tick = self._tick_for(t)
+        self._slots[entry.due_tick % len(self._slots)].add(entry)
+
+    def _expire(self, entry, now):
+        idle = now - entry.last_seen
+        consumer = entry.consumer
+
+        if idle >= self.down_timeout:
+            del self._entries[consumer]
+            entry.due_tick = None
+            logger.info("No heartbeat for %.0fs, closing.", idle, extra=consumer.log_extra)
+            consumer.status_down()
+            asyncio.ensure_future(consumer.close())
+            return
+
+        if idle >= self.unresponsive_timeout:
+            if not entry.unresponsive:
+                entry.unresponsive = True
+                consumer.status_unresponsive()
+            next_deadline = entry.last_seen + self.down_timeout
+        elif idle >= self.ping_interval:
+            next_deadline = entry.last_seen + self.unresponsive_timeout
+        else:
+            self._schedule(entry, entry.last_seen + self.ping_interval)
+            return
+
+        asyncio.ensure_future(consumer.send_ping())
+        self._schedule(entry, min(next_deadline, now + self.ping_interval))
+
+    def advance(self, now=None):
+        """Process every tick up to `now`. Returns the number of entries examined."""
+        if now is None:
+            now = time.monotonic()
+        target_tick = int((now - self._epoch) / self.tick)
+
+        examined = 0
+        while self._current_tick < target_tick:
+            self._current_tick += 1
+            slot = self._slots[self._current_tick % len(self._slots)]
+            due = [entry for entry in slot if entry.due_tick == self._current_tick]
+            for entry in due:
+                slot.discard(entry)
+                self._expire(entry, now)
+            examined += len(due)
+        return examined
+
+    # Background Task
+    # ---------------
+
+    def start(self):
+        """Ensure the tick task is running on the current event loop."""
+        loop = asyncio.get_event_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            if self._epoch is None:
+                self._epoch = time.monotonic()
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.advance()
+            except Exception:
+                logger.exception("Heartbeat scheduler tick failed.")
+
+
+heartbeat_scheduler = HeartbeatScheduler()
+
+metrics.register_gauge('bobolith_appliances_connected',
+                       'Appliances connected to this process.',
+                       heartbeat_scheduler.__len__)
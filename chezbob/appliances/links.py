@@ -0,0 +1,97 @@
+"""
+Runtime support for appliance links.
+
+An `ApplianceLink` is a `key`-labelled edge from a source appliance to a
+destination appliance. At runtime, messages travel along links through the
+channel layer:
+
+- every connected appliance joins its own group (`appliance_group`), and
+- every connected appliance joins one group per incoming link
+  (`link_group(src, key)`),
+
+so an appliance sending on one of its link keys is a single `group_send`,
+which the channel layer fans out to every destination, in whichever process
+it is connected.
+
+The link graph is loaded once and cached (`link_graph`). It is invalidated by
+the `ApplianceLink` signals (see `.signals`), which also tell affected
+destinations to join or leave groups, and otherwise expires after a TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from uuid import UUID
+
+from django.conf import settings
+
+from .models import ApplianceLink
+
+DEFAULT_TTL = 300
+
+
+def appliance_group(uuid) -> str:
+    """Name of the channel-layer group containing the given appliance."""
+    return f'appliance.{uuid}'
+
+
+def link_group(src_uuid, key: str) -> str:
+    """Name of the channel-layer group of destinations linked from `src_uuid` with `key`."""
+    # Link keys are free text; hash them into something that is a valid group name.
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+    return f'link.{src_uuid}.{digest}'
+
+
+class LinkGraph:
+    """
+    Cached view of all appliance links.
+    """
+
+    def __init__(self, queryset, ttl=None):
+        self.queryset = queryset
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # dst uuid -> {(src uuid, key)}
+        self._incoming = None
+        self._expires_at = 0.0
+
+    def get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'BOBOLITH_APPLIANCE_LINK_CACHE_TTL', DEFAULT_TTL)
+
+    def is_fresh(self):
+        return self._incoming is not None and self._expires_at > time.monotonic()
+
+    def load(self):
+        """(Re)load the graph from the database, and return it. This is synchronous."""
+        incoming = defaultdict(set)
+        for src, dst, key in self.queryset.values_list('src_appliance_id', 'dst_appliance_id', 'key'):
+            incoming[dst].add((src, key))
+        incoming = dict(incoming)
+        with self._lock:
+            self._incoming = incoming
+            self._expires_at = time.monotonic() + self.get_ttl()
+        return incoming
+
+    def invalidate(self):
+        with self._lock:
+            self._incoming = None
+
+    def incoming(self, uuid):
+        """
+        Return the `(src uuid, key)` pairs of the links into the given appliance.
+        May hit the database if the cache is stale; check `is_fresh()` first from async code.
+        """
+        # Read the graph once: it may be invalidated (from another thread) at any point.
+        incoming, expires_at = self._incoming, self._expires_at
+        if incoming is None or expires_at <= time.monotonic():
+            incoming = self.load()
+        return incoming.get(UUID(str(uuid)), frozenset())
+
+    def incoming_groups(self, uuid):
+        return {link_group(src, key) for src, key in self.incoming(uuid)}
+
+
+link_graph = LinkGraph(ApplianceLink.objects.all())
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ...provisioning import (FORMATS, DEFAULT_BATCH_SIZE, APPLIANCE_FIELDS, LINK_FIELDS,
+                             guess_format, write_records, export_appliances, export_links)
+
+
+class Command(BaseCommand):
+    help = "Export appliances (or, with --links, appliance links) as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help="Output file (default: stdout).")
+        parser.add_argument('--links', action='store_true', help="Export links instead of appliances.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: guessed from the output file extension, or csv).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, output, links, format, chunk_size, **options):
+        if format is None:
+            format = 'csv' if output == '-' else guess_format(output)
+
+        if links:
+            fields, records = LINK_FIELDS, export_links(chunk_size)
+        else:
+            fields, records = APPLIANCE_FIELDS, export_appliances(chunk_size)
+
+        if output == '-':
+            write_records(self.stdout, format, fields, records)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                write_records(f, format, fields, records)
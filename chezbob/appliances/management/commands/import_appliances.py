@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from ...links import link_group
+from ...provisioning import (FORMATS, DEFAULT_BATCH_SIZE, ProvisioningError,
+                             guess_format, open_records, read_records, import_appliances, import_links)
+from ...signals import notify_link_changed
+
+
+class Command(BaseCommand):
+    help = "Import (create or update) appliances, and optionally appliance links, from CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('appliances', nargs='?',
+                            help="Appliances file (uuid, name, consumer), or - for stdin.")
+        parser.add_argument('--links', help="Links file (src, dst, key).")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="File format (default: guessed from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Validate and roll back.")
+
+    def handle(self, *args, appliances, links, format, batch_size, dry_run, **options):
+        if not appliances and not links:
+            raise CommandError("Nothing to import: give an appliances file and/or --links.")
+
+        try:
+            with transaction.atomic():
+                if appliances:
+                    with open_records(appliances) as f:
+                        records = read_records(f, format or guess_format(appliances))
+                        created, updated = import_appliances(records, batch_size=batch_size)
+                    self.stdout.write(f"Appliances: {created} created, {updated} updated.")
+
+                new_links = []
+                if links:
+                    with open_records(links) as f:
+                        new_links = import_links(read_records(f, format or guess_format(links)),
+                                                 batch_size=batch_size)
+                    self.stdout.write(f"Links: {len(new_links)} created.")
+
+                if dry_run:
+                    transaction.set_rollback(True)
+                    self.stdout.write("Dry run: rolled back.")
+                    return
+
+                # Bulk operations don't send model signals; do their work here.
+                for link in new_links:
+                    notify_link_changed(link.dst_appliance_id, add=[link_group(link.src_appliance_id, link.key)])
+        except (ProvisioningError, IntegrityError, OSError) as e:
+            raise CommandError(str(e))
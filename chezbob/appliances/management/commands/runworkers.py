@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DAPHNE = 'from daphne.cli import CommandLineInterface; CommandLineInterface.entrypoint()'
+
+
+class Command(BaseCommand):
+    help = "Serve the ASGI application from several daphne worker processes sharing one listening socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Number of worker processes (default: number of CPUs).")
+        parser.add_argument('--bind', default='127.0.0.1', help="Address to listen on.")
+        parser.add_argument('--port', type=int, default=8000, help="Port to listen on.")
+        parser.add_argument('--application', default='chezbob.bobolith.asgi:application',
+                            help="ASGI application to serve.")
+
+    def handle(self, *args, workers, bind, port, application, **options):
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+
+        backend = settings.CHANNEL_LAYERS.get('default', {}).get('BACKEND', '')
+        if workers > 1 and backend.endswith('InMemoryChannelLayer'):
+            self.stderr.write(self.style.WARNING(
+                "The in-memory channel layer is not shared between workers: appliance links and "
+                "server-initiated sends will only reach appliances connected to the same worker. "
+                "Set REDIS_URL to share a channel layer."))
+
+        # Bind once here; every worker accepts connections from the same socket.
+        sock = socket.socket(socket.AF_INET6 if ':' in bind else socket.AF_INET)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((bind, port))
+        except OSError as e:
+            raise CommandError(f"Could not bind to {bind}:{port}: {e}")
+        sock.listen(1024)
+        sock.set_inheritable(True)
+        fd = sock.fileno()
+
+        self.stdout.write(f"Serving {application} on {bind}:{port} with {workers} worker(s).")
+        processes = [
+            subprocess.Popen([sys.executable, '-c', DAPHNE, '--fd', str(fd), application], pass_fds=(fd,))
+            for _ in range(workers)
+        ]
+
+        def terminate(*_):
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, terminate)
+        try:
+            for process in processes:
+                process.wait()
+        except KeyboardInterrupt:
+            terminate()
+            for process in processes:
+                process.wait()
+        finally:
+            sock.close()
@@ -0,0 +1,125 @@
+"""
+In-process instrumentation for appliance websockets.
+
+Consumers time each phase of handling a connection (connect, disconnect,
+decode, dispatch, handler) per consumer class and message type, and the status
+tracker times its database writes. Timings go into histograms that are
+rendered in the Prometheus text format by `chezbob.appliances.views.metrics`.
+
+Histograms are sharded per thread, so recording never takes a lock. When
+`BOBOLITH_METRICS_ENABLED` is off, the instrumented code paths skip timing
+entirely after checking `metrics.enabled`.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple, Union
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASE_METRIC = 'bobolith_appliance_phase_seconds'
+PHASE_HELP = 'Time spent in each phase of handling appliance websockets.'
+
+GaugeValue = Union[float, List[Tuple[Dict[str, str], float]]]
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets. Each thread records into its own shard.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[list] = []
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            # Per-bucket counts (the last one is +Inf), followed by the sum.
+            shard = [0] * (len(self.buckets) + 1) + [0.0]
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Return the cumulative bucket counts and the sum of all observations."""
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for shard in list(self._shards):
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+        return counts, total
+
+
+class Metrics:
+    """
+    Registry of phase histograms (keyed by phase, consumer and message type) and gauges.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def observe(self, phase: str, consumer: str, msg_type: str, seconds: float):
+        key = (phase, consumer, msg_type)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        histogram.observe(seconds)
+
+    def register_gauge(self, name: str, help_text: str, fn: Callable[[], GaugeValue]):
+        """
+        Register a gauge whose value is computed by calling `fn` at render time.
+        `fn` returns either a number or a list of ({label: value}, number) pairs.
+        """
+        self._gauges[name] = (help_text, fn)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [f'# HELP {PHASE_METRIC} {PHASE_HELP}',
+                 f'# TYPE {PHASE_METRIC} histogram']
+        for (phase, consumer, msg_type), histogram in sorted(self._histograms.items()):
+            labels = f'phase="{phase}",consumer="{consumer}",msg_type="{msg_type}"'
+            counts, total = histogram.snapshot()
+            for le, count in zip(histogram.buckets + ('+Inf',), counts):
+                lines.append(f'{PHASE_METRIC}_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f'{PHASE_METRIC}_sum{{{labels}}} {total}')
+            lines.append(f'{PHASE_METRIC}_count{{{labels}}} {counts[-1]}')
+
+        for name, (help_text, fn) in sorted(self._gauges.items()):
+            lines += [f'# HELP {name} {help_text}',
+                      f'# TYPE {name} gauge']
+            value = fn()
+            if isinstance(value, list):
+                for labels, labelled_value in value:
+                    labels = ','.join(f'{label}="{label_value}"' for label, label_value in labels.items())
+                    lines.append(f'{name}{{{labels}}} {labelled_value}')
+            else:
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def message_type(msg) -> str:
+    """The metrics label for a (possibly undecoded) message."""
+    return getattr(type(msg), 'msg_type', 'unknown')
+
+
+metrics = Metrics(enabled=getattr(settings, 'BOBOLITH_METRICS_ENABLED', False))
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:04
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appliances', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appliance',
+            name='status',
+            field=models.CharField(choices=[('UP', 'Up'), ('DOWN', 'Down'), ('UNRESPONSIVE', 'Unresponsive'), ('NOT_APPLICABLE', 'N/A')], default='DOWN', max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='appliance',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False, verbose_name='appliance uuid'),
+        ),
+    ]
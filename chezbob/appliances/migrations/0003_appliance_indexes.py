@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appliances', '0002_appliance_status_choices'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appliance',
+            name='last_heartbeat_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='last heartbeat at'),
+        ),
+        migrations.AlterField(
+            model_name='appliance',
+            name='status',
+            field=models.CharField(choices=[('UP', 'Up'), ('DOWN', 'Down'), ('UNRESPONSIVE', 'Unresponsive'), ('NOT_APPLICABLE', 'N/A')], db_index=True, default='DOWN', max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='appliancelink',
+            index=models.Index(fields=['src_appliance', 'key'], name='appliances__src_app_d81188_idx'),
+        ),
+    ]
@@ -18,14 +18,14 @@ class Appliance(models.Model):
     STATUS_CHOICES = (
         (STATUS_UP, 'Up'),
         (STATUS_DOWN, 'Down'),
-        (STATUS_DOWN, 'Unresponsive'),
+        (STATUS_UNRESPONSIVE, 'Unresponsive'),
         (STATUS_NA, "N/A")
     )
 
-    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default=STATUS_DOWN)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default=STATUS_DOWN, db_index=True)
 
     last_connected_at = models.DateTimeField(_('last connected at'), blank=True, null=True)
-    last_heartbeat_at = models.DateTimeField(_('last heartbeat at'), blank=True, null=True)
+    last_heartbeat_at = models.DateTimeField(_('last heartbeat at'), blank=True, null=True, db_index=True)
 
     @property
     def status_icon(self):
@@ -63,3 +63,8 @@ class ApplianceLink(models.Model):
                                       verbose_name=_('destination appliance'),
                                       on_delete=models.CASCADE,
                                       related_name='dst_links')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['src_appliance', 'key']),
+        ]
@@ -0,0 +1,250 @@
+"""
+Bounded outbound message queues for appliance connections.
+
+Every message sent to an appliance goes through its connection's queue.
+Channels has no way to report that a client has stopped reading, so once a
+message is handed to the server it is buffered there without limit. The queue
+therefore keeps messages here instead, in at most `maxsize` messages, while
+
+- the appliance is unresponsive (see `.heartbeat`): the queue is paused, or
+- `window` messages have been sent that the appliance has not acknowledged.
+  Once half the window is in flight, the queue calls `probe(seq)` (the
+  consumer sends a ping), and the appliance's answer (a pong) acknowledges
+  every message sent before it. Unanswered probes are re-sent every
+  `probe_interval` seconds. This bounds appliances that keep sending but have
+  stopped reading, which the heartbeat cannot tell apart from healthy ones.
+  Only appliances that echo probes can use a window, so it is off (0) unless
+  configured.
+
+When the queue is full, its policy decides what happens:
+
+- `drop-oldest`: the oldest queued message is dropped.
+- `coalesce`: the oldest queued message of the same type as the new one is
+  dropped (the newer one supersedes it), or else the oldest message.
+- `disconnect`: the queue is dropped and `on_overflow` is called, e.g. to close
+  the connection.
+
+Queue depths and drop counts are exposed, summed over all connections, through
+`.metrics`.
+"""
+import asyncio
+import logging
+import weakref
+from collections import deque
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop-oldest'
+COALESCE = 'coalesce'
+DISCONNECT = 'disconnect'
+POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+DEFAULT_MAXSIZE = 100
+DEFAULT_WINDOW = 0
+DEFAULT_PROBE_INTERVAL = 10.0
+
+# All live queues, for metrics.
+_queues = weakref.WeakSet()
+_dropped_total = 0
+
+
+class OutboundQueue:
+    """
+    Queues outbound messages for one connection, sending them in order.
+    """
+
+    def __init__(self, send, maxsize: int = DEFAULT_MAXSIZE, policy: str = DROP_OLDEST,
+                 on_overflow=None, name: str = '', window: int = DEFAULT_WINDOW, probe=None,
+                 probe_interval: float = DEFAULT_PROBE_INTERVAL):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbound queue policy {policy!r}; expected one of {POLICIES}.")
+        # `send` is a coroutine function that sends one message as a frame.
+        self._send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self._on_overflow = on_overflow
+        self.name = name
+        # Messages that may be sent without acknowledgement (0 for no limit), and
+        # the coroutine function that asks for one (with the number of messages sent).
+        self.window = window
+        self._probe = probe
+        self.probe_interval = probe_interval
+        if window and probe is None:
+            raise ValueError("An outbound queue with a window needs a probe.")
+
+        self.paused = False
+        self.overflowed = False
+        self.dropped = 0
+        self.sent = 0
+        self.acknowledged = 0
+        self._probing = None
+        self._reprobe_handle = None
+
+        self._queue = deque()
+        self._sending = False
+        self._task = None
+        _queues.add(self)
+
+    def __len__(self):
+        return len(self._queue)
+
+    @property
+    def in_flight(self):
+        """Messages sent that the appliance has not acknowledged."""
+        return self.sent - self.acknowledged
+
+    @property
+    def blocked(self):
+        """Whether sending waits for an acknowledgement."""
+        return bool(self.window) and self.in_flight >= self.window
+
+    @property
+    def stalled(self):
+        return self.paused or self.blocked
+
+    async def send(self, msg):
+        """Queue a message, and send everything queued unless stalled or already sending."""
+        self.put(msg)
+        if not self._sending and not self.stalled:
+            await self._drain()
+
+    def put(self, msg):
+        """Queue a message without sending it."""
+        if self.overflowed:
+            self._drop(1)
+            return
+        if len(self._queue) >= self.maxsize and not self._make_room(msg):
+            return
+        self._queue.append(msg)
+
+    async def flush(self):
+        """Send everything queued (e.g. before closing), dropping what cannot be sent."""
+        if not self.paused:
+            await self._drain()
+        self.clear()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self._restart()
+
+    def acknowledge(self, seq: int):
+        """The appliance has read the first `seq` messages sent."""
+        if seq > self.acknowledged:
+            self.acknowledged = min(seq, self.sent)
+        if self._probing is not None and seq >= self._probing:
+            self._probing = None
+            self._cancel_reprobe()
+        self._restart()
+
+    def clear(self):
+        """Drop everything queued."""
+        self._drop(len(self._queue))
+        self._queue.clear()
+
+    def cancel(self):
+        """Drop everything queued and stop sending (e.g. because the connection has gone away)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._cancel_reprobe()
+        self.clear()
+
+    def _make_room(self, msg) -> bool:
+        """Make room for `msg` according to the policy. Returns whether it should be queued."""
+        if self.policy == DISCONNECT:
+            self.overflowed = True
+            self._drop(1)
+            self.clear()
+            logger.warning("Outbound queue for %s overflowed.", self.name)
+            if self._on_overflow is not None:
+                self._on_overflow()
+            return False
+
+        if self.policy == COALESCE:
+            msg_type = getattr(type(msg), 'msg_type', None)
+            if msg_type is not None:
+                for i, queued in enumerate(self._queue):
+                    if getattr(type(queued), 'msg_type', None) == msg_type:
+                        del self._queue[i]
+                        self._drop(1)
+                        return True
+
+        self._queue.popleft()
+        self._drop(1)
+        return True
+
+    def _drop(self, count):
+        global _dropped_total
+        self.dropped += count
+        _dropped_total += count
+
+    def _restart(self):
+        if self._queue and not self._sending and not self.stalled:
+            self._task = asyncio.ensure_future(self._drain_logged())
+
+    async def _drain(self):
+        self._sending = True
+        try:
+            while self._queue and not self.stalled:
+                await self._send(self._queue.popleft())
+                self.sent += 1
+                if self.window and self._probing is None and self.in_flight * 2 >= self.window:
+                    self._start_probe()
+                    await self._probe(self._probing)
+        finally:
+            self._sending = False
+
+    def _start_probe(self):
+        """Wait for acknowledgement of everything sent so far, probing again if none comes."""
+        self._probing = self.sent
+        self._cancel_reprobe()
+        self._reprobe_handle = asyncio.get_event_loop().call_later(self.probe_interval, self._reprobe)
+
+    def _cancel_reprobe(self):
+        if self._reprobe_handle is not None:
+            self._reprobe_handle.cancel()
+            self._reprobe_handle = None
+
+    def _reprobe(self):
+        self._reprobe_handle = None
+        if self._probing is None:
+            return
+        logger.warning("Outbound queue for %s has %d unacknowledged messages; probing again.",
+                       self.name, self.in_flight)
+        self._start_probe()
+        asyncio.ensure_future(self._probe_logged(self._probing))
+
+    async def _probe_logged(self, seq):
+        try:
+            await self._probe(seq)
+        except Exception:
+            logger.exception("Failed to probe the appliance for outbound queue %s.", self.name)
+
+    async def _drain_logged(self):
+        try:
+            await self._drain()
+        except Exception:
+            logger.exception("Failed to send queued outbound messages for %s.", self.name)
+        finally:
+            self._task = None
+
+
+# Gauges are aggregated over connections; queue names (appliance UUIDs) are
+# credentials, and must not appear in metrics.
+metrics.register_gauge('bobolith_appliance_outbound_queued',
+                       'Messages queued for appliances.',
+                       lambda: sum(len(queue) for queue in list(_queues)))
+metrics.register_gauge('bobolith_appliance_outbound_queued_max',
+                       'Messages queued for the appliance with the most queued.',
+                       lambda: max((len(queue) for queue in list(_queues)), default=0))
+metrics.register_gauge('bobolith_appliance_outbound_stalled',
+                       'Appliance connections not being sent to (unresponsive, or not acknowledging).',
+                       lambda: sum(1 for queue in list(_queues) if queue.stalled))
+metrics.register_gauge('bobolith_appliance_outbound_dropped_since_start',
+                       'Messages dropped from appliance outbound queues since this process started.',
+                       lambda: _dropped_total)
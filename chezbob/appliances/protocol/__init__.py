@@ -2,5 +2,6 @@ __all__ = [
     'MESSAGE_TYPES',
     'MessageHeader',
     'PingMessage',
-    'PongMessage'
+    'PongMessage',
+    'BatchMessage'
 ]
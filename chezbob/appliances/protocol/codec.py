@@ -0,0 +1,203 @@
+"""
+Precompiled encoders/decoders for appliance protocol messages.
+
+Every message class created through `message_mixin` is registered here when the
+class is created. Registration generates a straight-line encoder (message ->
+dict) and decoder (dict -> message) specialised to that class's fields, so the
+hot path does no reflection: no `__slots__` walking, no `hasattr`/`setattr`
+loops, and no per-dict object hook.
+
+`MessageCodec` pairs these with a JSON backend: `orjson` (a dependency; it
+works natively with bytes), or the standard library `json` module if it is
+missing, which is much slower. See `benchmarks/codec.py` for a comparison with the
+`MessageEncoder`/`MessageDecoder` in `.messages`.
+
+Clients may negotiate a compact binary encoding through the websocket
+subprotocol (see `SUBPROTOCOLS` and `negotiate`). JSON text frames remain the
+default for clients that don't ask for anything else.
+"""
+import json
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# msg_type -> decoder
+DECODERS: Dict[str, Callable[[dict], object]] = {}
+
+
+def message_fields(cls) -> Tuple[str, ...]:
+    """Return the names of the (non-header) fields of a message class, in MRO order."""
+    fields = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for slot in slots:
+            if slot != 'header' and slot not in fields:
+                fields.append(slot)
+    return tuple(fields)
+
+
+def _compile(name, source, namespace):
+    exec(compile(source, f'<codec {name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+def generate_encoder(cls, fields):
+    lines = ['def encode(msg):',
+             '    header = msg.header',
+             "    content = {'header': {'msg_type': header.msg_type, 'version': header.version}}"]
+    for field in fields:
+        lines += ['    try:',
+                  f'        content[{field!r}] = msg.{field}',
+                  '    except AttributeError:',
+                  '        pass']
+    lines.append('    return content')
+    return _compile('encode', '\n'.join(lines), {})
+
+
+def generate_decoder(cls, fields, header_cls):
+    # Fields listed in `field_decoders` have their (JSON) content passed through the given function.
+    field_decoders = getattr(cls, 'field_decoders', {})
+    namespace = {'new': object.__new__, 'cls': cls, 'header_cls': header_cls}
+
+    lines = ['def decode(content):',
+             '    msg = new(cls)',
+             "    header = content['header']",
+             "    msg.header = header_cls(header['msg_type'], header.get('version'))"]
+    for field in fields:
+        value = f'content[{field!r}]'
+        if field in field_decoders:
+            namespace[f'decode_{field}'] = field_decoders[field]
+            value = f'decode_{field}({value})'
+        lines += [f'    if {field!r} in content:',
+                  f'        msg.{field} = {value}']
+    lines.append('    return msg')
+    return _compile('decode', '\n'.join(lines), namespace)
+
+
+def register(cls, msg_type: str, header_cls):
+    """Generate and attach the encoder/decoder for a message class."""
+    fields = message_fields(cls)
+    cls.msg_type = msg_type
+    cls._encode = staticmethod(generate_encoder(cls, fields))
+    cls._decode = staticmethod(generate_decoder(cls, fields, header_cls))
+    DECODERS[msg_type] = cls._decode
+
+
+def decode_content(content, accept=None):
+    """
+    Turn decoded JSON content into a message, if it is one.
+    Anything that isn't a registered message is returned unchanged, as is any
+    message whose type is not in `accept` (if given), without building it.
+    """
+    if type(content) is dict:
+        header = content.get('header')
+        if type(header) is dict:
+            msg_type = header.get('msg_type')
+            if accept is not None and msg_type not in accept:
+                return content
+            decoder = DECODERS.get(msg_type)
+            if decoder is not None:
+                return decoder(content)
+    return content
+
+
+def decode_content_list(items):
+    return [decode_content(item) for item in items]
+
+
+def _default(o):
+    try:
+        return o._encode(o)
+    except AttributeError:
+        raise TypeError(f'Object of type {o.__class__.__name__} '
+                        f'is not JSON serializable')
+
+
+class MessageCodec:
+    """
+    Encodes messages to, and decodes messages from, JSON text or bytes.
+    """
+    # Whether this codec's frames must be sent as binary (`bytes_data`) frames.
+    binary = False
+
+    def __init__(self, use_orjson=None):
+        if use_orjson is None:
+            use_orjson = orjson is not None
+        if use_orjson and orjson is None:
+            raise ImportError("orjson is not installed.")
+        self.use_orjson = use_orjson
+
+        if use_orjson:
+            self._dumps_bytes = lambda content: orjson.dumps(content, default=_default)
+            self._dumps = lambda content: orjson.dumps(content, default=_default).decode('utf-8')
+            self._loads = orjson.loads
+        else:
+            self._dumps = json.JSONEncoder(default=_default, separators=(',', ':')).encode
+            self._dumps_bytes = lambda content: self._dumps(content).encode('utf-8')
+            self._loads = json.loads
+
+    @staticmethod
+    def to_content(msg):
+        encode = getattr(type(msg), '_encode', None)
+        return msg if encode is None else encode(msg)
+
+    def encode(self, msg) -> str:
+        return self._dumps(self.to_content(msg))
+
+    def encode_bytes(self, msg) -> bytes:
+        return self._dumps_bytes(self.to_content(msg))
+
+    def decode(self, data: Union[str, bytes], accept=None):
+        return decode_content(self._loads(data), accept)
+
+
+class MsgpackCodec(MessageCodec):
+    """
+    Encodes messages to, and decodes messages from, MessagePack bytes.
+    """
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("msgpack is not installed.")
+        self._packer = msgpack.Packer(default=_default, use_bin_type=True, autoreset=True)
+
+    def encode(self, msg) -> str:
+        raise TypeError("MessagePack frames are binary; use encode_bytes().")
+
+    def encode_bytes(self, msg) -> bytes:
+        return self._packer.pack(self.to_content(msg))
+
+    def decode(self, data: Union[str, bytes], accept=None):
+        return decode_content(msgpack.unpackb(data, raw=False), accept)
+
+
+default_codec = MessageCodec()
+
+# Websocket subprotocol name -> codec
+SUBPROTOCOLS: Dict[str, MessageCodec] = {'bobolith.json': default_codec}
+if msgpack is not None:
+    SUBPROTOCOLS['bobolith.msgpack'] = MsgpackCodec()
+
+
+def negotiate(offered: Iterable[str]) -> Tuple[Optional[str], MessageCodec]:
+    """
+    Pick the first subprotocol offered by the client that we support (clients
+    list them in order of preference). Returns the accepted subprotocol (or
+    None, for clients that offered none we support) and its codec.
+    """
+    for subprotocol in offered:
+        codec = SUBPROTOCOLS.get(subprotocol)
+        if codec is not None:
+            return subprotocol, codec
+    return None, default_codec
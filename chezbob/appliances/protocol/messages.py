@@ -1,7 +1,22 @@
 import json
 
 from bidict import bidict
-from django.conf import settings
+
+from . import codec
+
+_protocol_version = None
+
+
+def protocol_version() -> int:
+    """
+    The protocol version of outgoing messages (`BOBOLITH_PROTOCOL_VERSION`).
+    Settings are read on first use, so importing the protocol doesn't require them.
+    """
+    global _protocol_version
+    if _protocol_version is None:
+        from django.conf import settings
+        _protocol_version = getattr(settings, 'BOBOLITH_PROTOCOL_VERSION', 0)
+    return _protocol_version
 
 
 class MessageHeader:
@@ -13,7 +28,8 @@ class MessageHeader:
     def __init__(self, msg_type, version=None):
         self.msg_type = msg_type
         if version is None:
-            self.version = settings.BOBOLITH_PROTOCOL_VERSION
+            version = protocol_version()
+        self.version = version
 
     def to_json(self):
         return {'msg_type': self.msg_type, 'version': self.version}
@@ -30,19 +46,21 @@ def message_mixin(msg_type: str):
 
         def __init__(self, header=None, **kwargs):
             if header is None:
-                self.header = MessageHeader(msg_type=msg_type)
+                header = MessageHeader(msg_type=msg_type)
+            self.header = header
 
             for key, value in kwargs.items():
                 setattr(self, key, value)
 
         def __init_subclass__(cls, **kwargs):
+            super().__init_subclass__(**kwargs)
             if cls not in MESSAGE_TYPES.inverse:
                 MESSAGE_TYPES[msg_type] = cls
+                codec.register(cls, msg_type, MessageHeader)
 
         def to_json(self):
-            return {slot: getattr(self, slot)
-                    for slot in self.__slots__
-                    if hasattr(self, slot)}
+            # Generated by `codec.register` when the class was created.
+            return self._encode(self)
 
     return MessageMixin
 
@@ -59,6 +77,17 @@ class PongMessage(message_mixin('pong')):
     pong: str
 
 
+class BatchMessage(message_mixin('batch')):
+    """
+    An ordered list of messages sent in a single frame.
+    """
+    __slots__ = ['messages']
+
+    messages: list
+
+    field_decoders = {'messages': codec.decode_content_list}
+
+
 def _encode(o):
     if o.__class__ in MESSAGE_TYPES.inverse:
         return o.to_json()
@@ -0,0 +1,231 @@
+"""
+Bulk import and export of the appliance fleet and its link graph.
+
+Records are read and written as CSV or JSON Lines (one JSON object per line),
+streaming, so files of any size are processed in constant memory:
+
+- appliances: `uuid`, `name`, `consumer`
+- links: `src`, `dst`, `key` (`src`/`dst` are appliance UUIDs)
+
+Imports are applied in batches with `bulk_create`/`bulk_update`; consumer
+paths are validated once per distinct path. Exports iterate over the database
+in chunks, and are written (or streamed over HTTP, see `export_response`) a
+batch of records at a time. See the `import_appliances` and
+`export_appliances` management commands, and the `export-appliances` view.
+"""
+import csv
+import io
+import json
+import sys
+import uuid
+from contextlib import nullcontext
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional
+
+from django.http import StreamingHttpResponse
+
+from .models import Appliance, ApplianceLink
+from .registry import consumer_registry
+
+APPLIANCE_FIELDS = ('uuid', 'name', 'consumer')
+LINK_FIELDS = ('src', 'dst', 'key')
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ProvisioningError(ValueError):
+    pass
+
+
+def guess_format(filename: str) -> str:
+    return 'csv' if filename.lower().endswith('.csv') else 'jsonl'
+
+
+# Reading & Writing
+# -----------------
+
+def open_records(filename):
+    """Open a records file for reading, or stdin for `-` (which is left open)."""
+    if filename == '-':
+        return nullcontext(sys.stdin)
+    return open(filename, newline='', encoding='utf-8')
+
+
+def read_records(f, fmt: str) -> Iterator[Dict[str, str]]:
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ProvisioningError(f"Line {line_number}: invalid JSON: {e}")
+                if not isinstance(record, dict):
+                    raise ProvisioningError(f"Line {line_number}: expected a JSON object.")
+                yield record
+
+
+def stream_records(fmt: str, fields, records: Iterable[tuple],
+                   batch_size=DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """Yield records (tuples of values for `fields`) as text, a batch of records at a time."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for batch in batched(records, batch_size):
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # No records; just the header.
+            yield buffer.getvalue()
+    else:
+        for batch in batched(records, batch_size):
+            yield ''.join(json.dumps(dict(zip(fields, record)), default=str) + '\n' for record in batch)
+
+
+def write_records(f, fmt: str, fields, records: Iterable[tuple]):
+    """Write records (tuples of values for `fields`) to `f` as they are produced."""
+    for text in stream_records(fmt, fields, records):
+        f.write(text)
+
+
+def export_response(fmt: str, fields, records: Iterable[tuple], filename: str) -> StreamingHttpResponse:
+    """A response streaming records as a file download, e.g. from an export view."""
+    response = StreamingHttpResponse(stream_records(fmt, fields, records), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Validation
+# ----------
+
+class ConsumerValidator:
+    """
+    Checks that consumer paths name importable appliance consumer classes
+    (see `.registry`), checking each distinct path only once.
+    """
+
+    def __init__(self):
+        self._errors: Dict[str, Optional[str]] = {}
+
+    def __call__(self, consumer_path: str) -> Optional[str]:
+        """Return an error message for an invalid consumer path, or None if it is valid."""
+        if consumer_path not in self._errors:
+            self._errors[consumer_path] = consumer_registry.check(consumer_path)
+        return self._errors[consumer_path]
+
+
+def _uuid(value, what, line_number):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ProvisioningError(f"Record {line_number}: invalid {what} UUID {value!r}.")
+
+
+# Import
+# ------
+
+def import_appliances(records, batch_size=DEFAULT_BATCH_SIZE, validate=None):
+    """
+    Create or update appliances from records. Returns (created, updated).
+    Records without a UUID are matched to existing appliances by name, or get a new UUID.
+    """
+    validate = validate or ConsumerValidator()
+    created = updated = 0
+    record_number = 0
+
+    for batch in batched(records, batch_size):
+        appliances, unidentified = {}, {}
+        for record in batch:
+            record_number += 1
+            consumer = (record.get('consumer') or '').strip()
+            error = validate(consumer)
+            if error:
+                raise ProvisioningError(f"Record {record_number}: {error}")
+            name = (record.get('name') or '').strip()
+            if not name:
+                raise ProvisioningError(f"Record {record_number}: missing name.")
+            if record.get('uuid'):
+                appliances[_uuid(record['uuid'], 'appliance', record_number)] = \
+                    Appliance(name=name, consumer=consumer)
+            else:
+                unidentified[name] = Appliance(name=name, consumer=consumer)
+
+        if unidentified:
+            by_name = dict(Appliance.objects.filter(name__in=list(unidentified)).values_list('name', 'pk'))
+            for name, appliance in unidentified.items():
+                appliances[by_name.get(name) or uuid.uuid4()] = appliance
+        for pk, appliance in appliances.items():
+            appliance.uuid = pk
+
+        existing = set(Appliance.objects.filter(pk__in=list(appliances)).values_list('pk', flat=True))
+        to_update = [appliance for pk, appliance in appliances.items() if pk in existing]
+        to_create = [appliance for pk, appliance in appliances.items() if pk not in existing]
+
+        Appliance.objects.bulk_update(to_update, fields=['name', 'consumer'])
+        Appliance.objects.bulk_create(to_create)
+        created += len(to_create)
+        updated += len(to_update)
+
+    return created, updated
+
+
+def import_links(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Create links from records, skipping ones that already exist. Returns the links created."""
+    created = []
+    record_number = 0
+
+    for batch in batched(records, batch_size):
+        links = set()
+        for record in batch:
+            record_number += 1
+            key = record.get('key') or ''
+            if not key:
+                raise ProvisioningError(f"Record {record_number}: missing link key.")
+            links.add((_uuid(record.get('src'), 'source', record_number),
+                       _uuid(record.get('dst'), 'destination', record_number),
+                       key))
+
+        srcs = {src for src, _, _ in links}
+        endpoints = srcs | {dst for _, dst, _ in links}
+        missing = endpoints - set(Appliance.objects.filter(pk__in=endpoints).values_list('pk', flat=True))
+        if missing:
+            raise ProvisioningError(f"Links refer to unknown appliances: {', '.join(sorted(map(str, missing)))}.")
+
+        existing = set(ApplianceLink.objects
+                       .filter(src_appliance_id__in=srcs)
+                       .values_list('src_appliance_id', 'dst_appliance_id', 'key'))
+        new_links = [ApplianceLink(src_appliance_id=src, dst_appliance_id=dst, key=key)
+                     for src, dst, key in links - existing]
+        ApplianceLink.objects.bulk_create(new_links)
+        created += new_links
+
+    return created
+
+
+# Export
+# ------
+
+def export_appliances(chunk_size=DEFAULT_BATCH_SIZE):
+    return Appliance.objects.order_by('name').values_list(*APPLIANCE_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def export_links(chunk_size=DEFAULT_BATCH_SIZE):
+    return ApplianceLink.objects \
+        .order_by('pk') \
+        .values_list('src_appliance_id', 'dst_appliance_id', 'key') \
+        .iterator(chunk_size=chunk_size)
@@ -0,0 +1,165 @@
+"""
+Registry of appliance consumer classes, by dotted path.
+
+Consumer classes are registered
+
+- with the `register_consumer` decorator,
+- by installed packages, through `bobolith.consumers` entry points
+  (e.g. `thing = package.consumers:ThingConsumer`), and
+- on demand, the first time a path is looked up.
+
+At startup (see `AppliancesAppConfig.ready`), `consumer_registry.preload()`
+imports and validates the consumer of every `Appliance` row, so that import
+costs are not paid by the first connecting appliance, and misconfigured
+appliances are reported at boot rather than on connect. The same validation is
+available as a system check.
+"""
+import importlib
+import logging
+from typing import Dict
+
+from django.core import checks
+from django.db import DatabaseError
+
+from .models import Appliance
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python < 3.8
+    entry_points = None
+
+ENTRY_POINT_GROUP = 'bobolith.consumers'
+
+logger = logging.getLogger(__name__)
+
+
+def consumer_path(klass) -> str:
+    return f'{klass.__module__}.{klass.__qualname__}'
+
+
+def import_consumer(path: str):
+    """
+    Import and return the consumer class at the given dotted path.
+    Raises `ImportError` if the module or class cannot be found.
+    """
+    [module_name, klass_name] = path.rsplit('.', 1)
+    module = importlib.import_module(module_name)
+    klass = getattr(module, klass_name, None)
+    if klass is None:
+        raise ImportError(f"Consumer class {klass_name} not found in module {module_name}.")
+    return klass
+
+
+def validate_consumer(klass, path: str):
+    """Raise `TypeError` if `klass` is not an appliance consumer class."""
+    from .consumers import ApplianceConsumer
+
+    if not (isinstance(klass, type) and issubclass(klass, ApplianceConsumer)):
+        raise TypeError(f"{path} is not an ApplianceConsumer.")
+
+
+class ConsumerRegistry:
+    """
+    Maps consumer paths to validated consumer classes.
+    """
+
+    def __init__(self):
+        self._classes = {}
+
+    def __contains__(self, path):
+        return path in self._classes
+
+    def __len__(self):
+        return len(self._classes)
+
+    def register(self, klass, path=None):
+        """Register a consumer class (under its own dotted path by default). Usable as a decorator."""
+        path = path or consumer_path(klass)
+        validate_consumer(klass, path)
+        self._classes[path] = klass
+        return klass
+
+    def get(self, path: str):
+        """
+        Return the consumer class at the given path, importing and registering it if necessary.
+        Raises `ImportError` if it cannot be imported and `TypeError` if it is not a consumer.
+        """
+        klass = self._classes.get(path)
+        if klass is None:
+            if '.' not in path:
+                raise ImportError(f"{path!r} is not a dotted path.")
+            klass = self.register(import_consumer(path), path)
+        return klass
+
+    def check(self, path: str):
+        """Return an error message if the consumer at the given path is invalid, or None."""
+        try:
+            self.get(path)
+        except (ImportError, TypeError) as e:
+            return f"Consumer {path} is invalid: {e}"
+        return None
+
+    def load_entry_points(self) -> Dict[str, str]:
+        """Register consumers declared by installed packages. Returns {entry point: error message}."""
+        if entry_points is not None:
+            declared = entry_points()
+            if hasattr(declared, 'select'):  # Python >= 3.10
+                found = declared.select(group=ENTRY_POINT_GROUP)
+            else:
+                found = declared.get(ENTRY_POINT_GROUP, ())
+        else:
+            import pkg_resources
+            found = pkg_resources.iter_entry_points(ENTRY_POINT_GROUP)
+
+        errors = {}
+        for entry_point in found:
+            try:
+                klass = entry_point.load()
+                self.register(klass)
+            except (ImportError, AttributeError, TypeError) as e:
+                errors[str(entry_point)] = f"Consumer entry point {entry_point} is invalid: {e}"
+        return errors
+
+    def preload(self, queryset=None) -> Dict[str, str]:
+        """
+        Register entry point consumers and the consumers of all appliances.
+        Returns {path: error message} for consumers that could not be registered.
+        """
+        if queryset is None:
+            queryset = Appliance.objects.all()
+
+        errors = self.load_entry_points()
+        try:
+            paths = list(queryset.order_by().values_list('consumer', flat=True).distinct())
+        except DatabaseError:
+            # e.g. before the appliances table has been created.
+            paths = []
+
+        for path in paths:
+            error = self.check(path)
+            if error:
+                errors[path] = error
+
+        for error in errors.values():
+            logger.error(error)
+        return errors
+
+
+consumer_registry = ConsumerRegistry()
+register_consumer = consumer_registry.register
+
+
+@checks.register('appliances')
+def check_consumers(app_configs=None, **kwargs):
+    try:
+        paths = list(Appliance.objects.order_by().values_list('consumer', flat=True).distinct())
+    except DatabaseError:
+        return []
+
+    errors = []
+    for path in paths:
+        error = consumer_registry.check(path)
+        if error:
+            errors.append(checks.Warning(error, hint="Fix the consumer of the appliances that use it.",
+                                         obj=path, id='appliances.W001'))
+    return errors
@@ -0,0 +1,30 @@
+"""
+Server-initiated sends to appliances.
+
+Every connected appliance's consumer is a member of that appliance's
+channel-layer group (see `.links.appliance_group`). Sending to the group
+therefore reaches the process currently holding the appliance's connection,
+whichever worker that is, without having to know where it is connected.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .links import appliance_group
+from .protocol.codec import MessageCodec
+
+
+async def send_to_appliance(uuid, msg):
+    """
+    Send a message to the appliance with the given UUID, wherever it is connected.
+    If the appliance is not connected the message is dropped.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        raise RuntimeError("Sending to appliances requires a channel layer (see CHANNEL_LAYERS).")
+    await channel_layer.group_send(appliance_group(uuid), {
+        'type': 'appliance.send',
+        'content': MessageCodec.to_content(msg),
+    })
+
+
+send_to_appliance_sync = async_to_sync(send_to_appliance)
@@ -1,49 +1,55 @@
-import importlib
-
 from channels.routing import URLRouter
-from django.db import close_old_connections
 from django.urls import path, re_path
 
-from .models import Appliance
+from .cache import consumer_cache, ConsumerClassCache
+from .db import database_sync_to_async
+from .status_feed import StatusFeedConsumer
 
 
 class ApplianceUUIDRouter:
     """
     Routes to different appliance consumers based on UUIDs.
+
+    Consumer classes are resolved through a `ConsumerClassCache`, so in the
+    steady state connecting requires neither a database query nor an import.
+    On a cache miss, the lookup runs on the appliance database executor rather
+    than blocking the event loop (see `DeferredConsumer`).
     """
 
-    def __init__(self, appliances_qs):
-        self.queryset = appliances_qs
+    def __init__(self, cache: ConsumerClassCache):
+        self.cache = cache
 
     def __call__(self, scope):
-        close_old_connections()
-
         kwargs = scope['url_route']['kwargs']
         uuid = kwargs['appliance_uuid']
 
-        try:
-            [consumer_path] = self.queryset.values_list('consumer').get(pk=uuid)
-        except Appliance.DoesNotExist:
-            raise ValueError(f"No appliance found for UUID ${uuid}.")
+        klass = self.cache.get_cached(uuid)
+        if klass is not None:
+            return klass(scope)
+        return DeferredConsumer(self.cache, scope, uuid)
 
-        # Ensure we have the most recent version (even if we have hot-reloading).
-        importlib.invalidate_caches()
 
-        [module_name, klass_name] = consumer_path.rsplit('.', 1)
-        try:
-            module = importlib.import_module(module_name)
-        except ModuleNotFoundError:
-            raise ValueError(f"Consumer module not found for appliance with UUID: ${uuid}")
+class DeferredConsumer:
+    """
+    An appliance consumer whose class is looked up when the connection starts,
+    for `ApplianceUUIDRouter` cache misses.
+    """
+    # Like appliance consumers, don't resolve a user (see `chezbob.accounts.middleware`).
+    needs_user = False
 
-        klass = getattr(module, klass_name)
-        if klass is None:
-            raise ValueError(f"Consumer class not found in module ${module} for appliance with UUID ${uuid}.")
+    def __init__(self, cache: ConsumerClassCache, scope, uuid):
+        self.cache = cache
+        self.scope = scope
+        self.uuid = uuid
 
-        return klass(scope)
+    async def __call__(self, receive, send):
+        klass = await database_sync_to_async(self.cache.get)(self.uuid)
+        await klass(self.scope)(receive, send)
 
 
 websocket_router = URLRouter([
-    path('ws/<uuid:appliance_uuid>/', ApplianceUUIDRouter(Appliance.objects.all()))
+    path('ws/<uuid:appliance_uuid>/', ApplianceUUIDRouter(consumer_cache)),
+    path('status/', StatusFeedConsumer),
 ])
 
 """
@@ -0,0 +1,65 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import consumer_cache
+from .links import link_graph, link_group, appliance_group
+from .models import Appliance, ApplianceLink
+
+
+@receiver(post_save, sender=Appliance, dispatch_uid='appliances.invalidate_consumer_cache.save')
+@receiver(post_delete, sender=Appliance, dispatch_uid='appliances.invalidate_consumer_cache.delete')
+def invalidate_consumer_cache(sender, instance, **kwargs):
+    consumer_cache.invalidate(instance.pk)
+
+
+# Appliance Links
+# ---------------
+
+def notify_link_changed(dst_uuid, add=(), discard=()):
+    """Tell the (connected) destination appliance which link groups to join or leave."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        async_to_sync(channel_layer.group_send)(appliance_group(dst_uuid), {
+            'type': 'appliance.link_changed',
+            'add': list(add),
+            'discard': list(discard),
+        })
+
+    transaction.on_commit(send)
+
+
+@receiver(pre_save, sender=ApplianceLink, dispatch_uid='appliances.remember_link')
+def remember_link(sender, instance, raw=False, **kwargs):
+    if instance.pk is None or raw:
+        instance._link_before = None
+    else:
+        instance._link_before = ApplianceLink.objects \
+            .filter(pk=instance.pk) \
+            .values_list('src_appliance_id', 'dst_appliance_id', 'key') \
+            .first()
+
+
+@receiver(post_save, sender=ApplianceLink, dispatch_uid='appliances.link_saved')
+def link_saved(sender, instance, **kwargs):
+    link_graph.invalidate()
+
+    before = getattr(instance, '_link_before', None)
+    after = (instance.src_appliance_id, instance.dst_appliance_id, instance.key)
+    if before == after:
+        return
+    if before is not None:
+        notify_link_changed(before[1], discard=[link_group(before[0], before[2])])
+    notify_link_changed(after[1], add=[link_group(after[0], after[2])])
+
+
+@receiver(post_delete, sender=ApplianceLink, dispatch_uid='appliances.link_deleted')
+def link_deleted(sender, instance, **kwargs):
+    link_graph.invalidate()
+    notify_link_changed(instance.dst_appliance_id,
+                        discard=[link_group(instance.src_appliance_id, instance.key)])
@@ -0,0 +1,85 @@
+"""
+Push feed of appliance status changes, for live dashboards.
+
+Appliance consumers publish every status transition to a channel-layer group.
+`StatusFeedConsumer` sends a client one snapshot of the fleet when it connects,
+then forwards the transitions as they happen, so watching the fleet does not
+poll the database.
+"""
+import asyncio
+import logging
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .db import database_sync_to_async
+from .models import Appliance
+
+logger = logging.getLogger(__name__)
+
+STATUS_GROUP = 'appliances.status'
+
+
+async def _group_send(channel_layer, event):
+    try:
+        await channel_layer.group_send(STATUS_GROUP, event)
+    except Exception:
+        logger.exception("Failed to publish appliance status change.")
+
+
+def publish_status(uuid, status):
+    """
+    Publish an appliance status transition to the feed.
+    Must be called from the event loop; does not wait for the message to be sent.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    asyncio.ensure_future(_group_send(channel_layer, {
+        'type': 'appliance.status',
+        'uuid': str(uuid),
+        'status': status,
+        'at': timezone.now().isoformat(),
+    }))
+
+
+def fleet_snapshot():
+    return [{
+        'uuid': str(appliance['uuid']),
+        'name': appliance['name'],
+        'status': appliance['status'],
+        'at': (appliance['last_heartbeat_at'] or appliance['last_connected_at'] or timezone.now()).isoformat(),
+    } for appliance in Appliance.objects.order_by('name').values(
+        'uuid', 'name', 'status', 'last_connected_at', 'last_heartbeat_at')]
+
+
+class StatusFeedConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Sends users who may view appliances a snapshot of the fleet, then every
+    status transition.
+    """
+    needs_user = True
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not await database_sync_to_async(user.has_perm)('appliances.view_appliance'):
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(STATUS_GROUP, self.channel_name)
+        await self.accept()
+        # Transitions published meanwhile are handled after this, so they are never overwritten.
+        snapshot = await database_sync_to_async(fleet_snapshot)()
+        await self.send_json({'type': 'snapshot', 'appliances': snapshot})
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(STATUS_GROUP, self.channel_name)
+
+    async def appliance_status(self, event):
+        await self.send_json({
+            'type': 'status',
+            'uuid': event['uuid'],
+            'status': event['status'],
+            'at': event['at'],
+        })
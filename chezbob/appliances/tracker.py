@@ -0,0 +1,173 @@
+"""
+Write-coalescing tracker for appliance status and heartbeats.
+
+Consumers record status transitions and heartbeats here instead of writing to
+the database directly. Changes are kept in memory, merged per appliance, and
+flushed periodically in batches: one `UPDATE ... WHERE uuid IN (...)` when every
+appliance in a batch shares the same values (e.g. all went DOWN), otherwise a
+single `bulk_update` per set of changed fields. This makes it cheap to record a
+heartbeat on every ping.
+
+Each process flushes its own changes, so with several workers an appliance
+that moves from one worker to another can have its old connection's DOWN
+written after its new connection's UP. Heartbeats therefore also record UP.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from time import perf_counter
+from typing import Any, Dict
+from uuid import UUID
+
+from django.conf import settings
+from django.utils import timezone
+
+from .db import database_sync_to_async
+from .metrics import metrics
+from .models import Appliance
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_BATCH_SIZE = 500
+
+
+class StatusTracker:
+    """
+    Keeps pending appliance status/heartbeat changes in memory and flushes them in batches.
+    """
+
+    def __init__(self, flush_interval=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._pending: Dict[UUID, Dict[str, Any]] = {}
+
+        self._task = None
+        self._loop = None
+        self._atexit_registered = False
+
+    def get_flush_interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, 'BOBOLITH_APPLIANCE_STATUS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    # Recording
+    # ---------
+
+    def record(self, uuid, **fields):
+        """Merge the given field values into the pending changes for an appliance."""
+        uuid = UUID(str(uuid))
+        with self._lock:
+            pending = self._pending.get(uuid)
+            if pending is None:
+                self._pending[uuid] = fields
+            else:
+                pending.update(fields)
+
+    def up(self, uuid):
+        now = timezone.now()
+        self.record(uuid, status=Appliance.STATUS_UP, last_connected_at=now, last_heartbeat_at=now)
+
+    def responsive(self, uuid):
+        self.record(uuid, status=Appliance.STATUS_UP, last_heartbeat_at=timezone.now())
+
+    def unresponsive(self, uuid):
+        self.record(uuid, status=Appliance.STATUS_UNRESPONSIVE)
+
+    def down(self, uuid):
+        self.record(uuid, status=Appliance.STATUS_DOWN)
+
+    def heartbeat(self, uuid):
+        self.record(uuid, status=Appliance.STATUS_UP, last_heartbeat_at=timezone.now())
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    # Flushing
+    # --------
+
+    def flush(self):
+        """
+        Write all pending changes to the database. Returns the number of appliances updated.
+        This is synchronous; from async code, run it on the database executor.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        start = perf_counter()
+        try:
+            self._write(pending)
+        except Exception:
+            self._requeue(pending)
+            raise
+        if metrics.enabled:
+            metrics.observe('db_write', type(self).__name__, '', perf_counter() - start)
+
+        return len(pending)
+
+    def _write(self, pending):
+        groups = defaultdict(dict)
+        for uuid, fields in pending.items():
+            groups[tuple(sorted(fields))][uuid] = fields
+
+        for field_names, changes in groups.items():
+            values = next(iter(changes.values()))
+            if all(fields == values for fields in changes.values()):
+                Appliance.objects.filter(pk__in=list(changes)).update(**values)
+            else:
+                objs = [Appliance(pk=uuid, **fields) for uuid, fields in changes.items()]
+                Appliance.objects.bulk_update(objs, fields=field_names, batch_size=self.batch_size)
+
+    def _requeue(self, pending):
+        # Put changes that failed to write back, without clobbering anything newer.
+        with self._lock:
+            for uuid, fields in pending.items():
+                newer = self._pending.get(uuid)
+                if newer is not None:
+                    fields.update(newer)
+                self._pending[uuid] = fields
+
+    # Background Flushing
+    # -------------------
+
+    def start(self):
+        """
+        Ensure the periodic flush task is running on the current event loop.
+        Safe (and cheap) to call on every connect.
+        """
+        loop = asyncio.get_event_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+
+        if not self._atexit_registered:
+            atexit.register(self._flush_at_exit)
+            self._atexit_registered = True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.get_flush_interval())
+            try:
+                await database_sync_to_async(self.flush)()
+            except Exception:
+                logger.exception("Failed to flush appliance status changes; will retry.")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush appliance status changes at exit.")
+
+
+status_tracker = StatusTracker()
+
+metrics.register_gauge('bobolith_appliance_status_pending',
+                       'Appliances with status/heartbeat changes waiting to be written.',
+                       lambda: status_tracker.pending_count)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.auth.decorators import permission_required
+from django.http import HttpResponse, HttpResponseBadRequest, Http404
+from django.utils.crypto import constant_time_compare
+
+from . import provisioning
+from .metrics import metrics as registry
+
+
+def _metrics_authorized(request):
+    """Whether the request has the metrics bearer token (if one is configured), or is from a staff user."""
+    token = getattr(settings, 'BOBOLITH_METRICS_TOKEN', '')
+    if token:
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        if scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token):
+            return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics(request):
+    """
+    Appliance websocket metrics, in the Prometheus text format. Requires
+    `Authorization: Bearer <BOBOLITH_METRICS_TOKEN>`, or a staff user.
+    """
+    if not registry.enabled:
+        raise Http404("Metrics are disabled.")
+    if not _metrics_authorized(request):
+        response = HttpResponse("Authentication required.", status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@permission_required('appliances.view_appliance', raise_exception=True)
+def export_appliances(request):
+    """
+    Stream all appliances (or, with `?links=1`, appliance links) as CSV or
+    JSON Lines (`?format=csv|jsonl`), as `manage.py export_appliances` does.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in provisioning.FORMATS:
+        return HttpResponseBadRequest(f"Unknown format {fmt!r}; expected one of {provisioning.FORMATS}.")
+
+    if request.GET.get('links'):
+        return provisioning.export_response(fmt, provisioning.LINK_FIELDS, provisioning.export_links(),
+                                            'appliance-links')
+    return provisioning.export_response(fmt, provisioning.APPLIANCE_FIELDS, provisioning.export_appliances(),
+                                        'appliances')
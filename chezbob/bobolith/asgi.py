@@ -0,0 +1,33 @@
+"""
+ASGI config for bobolith project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+for ASGI servers such as daphne (see also `manage.py runworkers`).
+
+For more information on this file, see
+https://channels.readthedocs.io/en/latest/deploying.html
+"""
+
+import os
+
+import django
+from channels.routing import get_default_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chezbob.bobolith.settings')
+
+django.setup()
+
+application = get_default_application()
+
+# Warm in-process caches that the server needs, before it accepts connections.
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'BOBOLITH_APPLIANCE_PRELOAD_CONSUMERS', True):
+    from chezbob.appliances.cache import consumer_cache
+
+    consumer_cache.load()
+
+if getattr(settings, 'BOBOLITH_USER_INDEX_PRELOAD', True):
+    from chezbob.accounts.lookup import user_index
+
+    user_index.load()
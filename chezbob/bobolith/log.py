@@ -0,0 +1,137 @@
+"""
+Non-blocking, structured logging.
+
+- `BackgroundHandler` puts records on a bounded queue and returns immediately;
+  a background thread formats and writes them with a target handler. Records
+  are only formatted on that thread, and if the queue is full they are dropped
+  (and counted) rather than blocking the caller.
+- `KeyValueFormatter` renders records as `key=value` pairs, including any
+  `extra` passed to the logging call.
+- `RateLimitFilter` limits how often the same message may be logged for the
+  same appliance, so reconnect storms don't flood the log.
+
+See `LOGGING` in `settings.py` for how these are wired up.
+"""
+import logging
+import queue
+import threading
+import time
+
+from django.utils.module_loading import import_string
+
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_STOP = object()
+
+
+class BackgroundHandler(logging.Handler):
+    """
+    Hands records to a background thread, which passes them to `target`.
+    """
+
+    def __init__(self, target='logging.StreamHandler', maxsize=10000, level=logging.NOTSET):
+        super().__init__(level)
+        self.target = import_string(target)()
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                break
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.target.handle(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': 'Log queue full, dropped records', 'dropped': dropped,
+                }))
+            self.target.handle(record)
+
+    def close(self):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout=5)
+        self.target.close()
+        super().close()
+
+
+def _quote(value):
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        return '"' + text.replace('"', '\\"') + '"'
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Formats records as `ts=... level=... logger=... msg=... key=value ...`.
+    """
+
+    def format(self, record):
+        pairs = [('ts', self.formatTime(record)),
+                 ('level', record.levelname),
+                 ('logger', record.name),
+                 ('msg', record.getMessage())]
+        pairs += [(key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS]
+        line = ' '.join(f'{key}={_quote(value)}' for key, value in pairs)
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per `period` seconds for each
+    (logger, message, appliance); the next record let through reports how many
+    were suppressed. Records at ERROR and above are always let through.
+    """
+
+    def __init__(self, period=10.0, burst=5):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._lock = threading.Lock()
+        # key -> [window start, count in window, suppressed]
+        self._windows = {}
+        self._next_prune = 0.0
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg, getattr(record, 'appliance', None))
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+    def _prune(self, now):
+        """Drop windows that have ended, so that keys seen once (e.g. per appliance) don't accumulate."""
+        self._windows = {key: window for key, window in self._windows.items() if now - window[0] < self.period}
+        self._next_prune = now + self.period
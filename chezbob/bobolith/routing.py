@@ -1,14 +1,16 @@
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.urls import path, include
 
+from chezbob.accounts.middleware import AuthMiddlewareStack, OriginValidator
 from chezbob.appliances import routing as appliances_routing
 
 application = ProtocolTypeRouter({
     # (http->django views is added by default)
-    'websocket': AuthMiddlewareStack(
-        URLRouter([
-            path(r'appliances/', appliances_routing.websocket_router)
-        ])
+    'websocket': OriginValidator(
+        AuthMiddlewareStack(
+            URLRouter([
+                path(r'appliances/', appliances_routing.websocket_router)
+            ])
+        )
     )
 })
@@ -42,31 +42,107 @@ INTERNAL_IPS = []
 if DEBUG:
     INTERNAL_IPS += ['127.0.0.1', '::1']
 
+# Deployment profile: 'development', 'production' or 'test'. The production
+# profile leaves out development-only apps and skips admin autodiscovery (our
+# admin site registers its models explicitly, and is only loaded with the URLconf
+# on the first HTTP request), so that ASGI workers start faster. The test profile
+# hashes passwords quickly and insecurely, for tests and benchmarks.
+BOBOLITH_PROFILE = env.str('BOBOLITH_PROFILE', 'development')
+PRODUCTION = BOBOLITH_PROFILE == 'production'
+
 # Bobolith Configuration
 BOBOLITH_PROTOCOL_VERSION = 0
 
+# Size of the thread pool that async appliance consumers use for database work.
+# This bounds the number of database connections held by appliance consumers.
+BOBOLITH_APPLIANCE_DB_WORKERS = env.int('BOBOLITH_APPLIANCE_DB_WORKERS', 4)
+
+# Pooled appliance database connections idle for longer than this (in seconds)
+# are checked before being reused.
+BOBOLITH_APPLIANCE_DB_HEALTH_CHECK_INTERVAL = 30.0
+
+# How often (in seconds) buffered appliance status and heartbeat changes are written.
+BOBOLITH_APPLIANCE_STATUS_FLUSH_INTERVAL = 1.0
+
+# Appliance heartbeat deadlines (in seconds): quiet appliances are pinged after
+# PING_INTERVAL, marked UNRESPONSIVE after UNRESPONSIVE_TIMEOUT, and marked DOWN
+# (and disconnected) after DOWN_TIMEOUT. Deadlines are checked every HEARTBEAT_TICK.
+BOBOLITH_APPLIANCE_HEARTBEAT_TICK = 1.0
+BOBOLITH_APPLIANCE_PING_INTERVAL = env.float('BOBOLITH_APPLIANCE_PING_INTERVAL', 10.0)
+BOBOLITH_APPLIANCE_UNRESPONSIVE_TIMEOUT = env.float('BOBOLITH_APPLIANCE_UNRESPONSIVE_TIMEOUT', 30.0)
+BOBOLITH_APPLIANCE_DOWN_TIMEOUT = env.float('BOBOLITH_APPLIANCE_DOWN_TIMEOUT', 90.0)
+
+# Import and validate the consumers of all appliances at startup (errors are
+# logged, and reported by `manage.py check`), and cache each appliance's consumer
+# when an ASGI server starts (see chezbob.bobolith.asgi).
+BOBOLITH_APPLIANCE_PRELOAD_CONSUMERS = env.bool('BOBOLITH_APPLIANCE_PRELOAD_CONSUMERS', True)
+
+# Messages queued per appliance connection while it is unresponsive or not
+# acknowledging, and what to do when the queue is full: 'drop-oldest',
+# 'coalesce' (keep the latest message of each type) or 'disconnect'. If
+# OUTBOUND_WINDOW > 0, at most that many messages are sent without the appliance
+# acknowledging them; only appliances that echo `outbound:<n>` pings do, so it
+# is 0 (no limit) by default. See chezbob.appliances.outbound.
+BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_SIZE = env.int('BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_SIZE', 100)
+BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_POLICY = env.str('BOBOLITH_APPLIANCE_OUTBOUND_QUEUE_POLICY', 'drop-oldest')
+BOBOLITH_APPLIANCE_OUTBOUND_WINDOW = env.int('BOBOLITH_APPLIANCE_OUTBOUND_WINDOW', 0)
+
+# How long (in seconds) a resolved appliance consumer class is cached for, and
+# how long a failed lookup (e.g. of an unknown appliance UUID) is cached for.
+BOBOLITH_APPLIANCE_CONSUMER_CACHE_TTL = 300
+BOBOLITH_APPLIANCE_CONSUMER_MISS_TTL = 10
+
+# How long (in seconds) the appliance link graph is cached for.
+BOBOLITH_APPLIANCE_LINK_CACHE_TTL = 300
+
+# Load the in-process user lookup index (chezbob.accounts.lookup) when an ASGI
+# server starts (see chezbob.bobolith.asgi; other processes, and `runserver`,
+# load it on the first lookup), and how long (in seconds) it is kept before
+# being reloaded.
+BOBOLITH_USER_INDEX_PRELOAD = env.bool('BOBOLITH_USER_INDEX_PRELOAD', True)
+BOBOLITH_USER_INDEX_TTL = 300
+
+# How long (in seconds) the user of a websocket's session is cached for
+# (see chezbob.accounts.middleware).
+BOBOLITH_WEBSOCKET_USER_CACHE_TTL = 10.0
+
+# Processes that bulk user imports hash passwords in (0 for one per CPU; see
+# chezbob.accounts.passwords).
+BOBOLITH_PASSWORD_HASH_WORKERS = env.int('BOBOLITH_PASSWORD_HASH_WORKERS', 0)
+
+# Record appliance websocket timings, exposed at /metrics (Prometheus text format)
+# to staff users, and to scrapers sending `Authorization: Bearer <token>`.
+BOBOLITH_METRICS_ENABLED = env.bool('BOBOLITH_METRICS_ENABLED', False)
+BOBOLITH_METRICS_TOKEN = env.str('BOBOLITH_METRICS_TOKEN', '')
+
+# Re-resolve appliance consumers on every connect (only honoured when DEBUG is on).
+BOBOLITH_APPLIANCE_HOT_RELOAD = env.bool('BOBOLITH_APPLIANCE_HOT_RELOAD', False)
+
 # Application definition
 
 INSTALLED_APPS = [
     'channels',
 
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig' if PRODUCTION else 'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
 
-    'django_extensions',
     # 'rest_framework',
 
-    'mptt',
-
     'chezbob.accounts',
     'chezbob.appliances',
     # 'chezbob.finances',
 ]
 
+if not PRODUCTION:
+    INSTALLED_APPS += [
+        'django_extensions',
+        'mptt',
+    ]
+
 # if DEBUG:
 #     INSTALLED_APPS.append('debug_toolbar')
 
@@ -112,8 +188,42 @@ DATABASES = {
     'default': env.db()
 }
 
+# Keep database connections open between requests (and appliance database tasks).
+# The appliance database executor then acts as a connection pool of
+# BOBOLITH_APPLIANCE_DB_WORKERS connections per process. Set to 0 to close
+# connections after every request/task.
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DATABASE_CONN_MAX_AGE', 600)
+
+# When connecting through pgbouncer in transaction pooling mode, server-side
+# cursors (used by QuerySet.iterator()) cannot be used.
+if env.bool('DATABASE_PGBOUNCER', False):
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 AUTH_USER_MODEL = 'accounts.User'
 
+# Channel Layers
+# https://channels.readthedocs.io/en/latest/topics/channel_layers.html
+#
+# Used to route messages between linked appliances. The in-memory layer only
+# reaches consumers in the same process; set REDIS_URL to share a layer between
+# processes (with channels_redis).
+
+if env.str('REDIS_URL', default=''):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [env.str('REDIS_URL')],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -132,6 +242,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+if BOBOLITH_PROFILE == 'test':
+    # Never in production: MD5 is cheap enough to hash in-process, and to brute-force.
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    BOBOLITH_PASSWORD_HASH_WORKERS = 1
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
 
@@ -171,14 +286,33 @@ REST_FRAMEWORK = {
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'kv': {
+            '()': 'chezbob.bobolith.log.KeyValueFormatter',
+        },
+    },
+    'filters': {
+        'appliance_rate_limit': {
+            '()': 'chezbob.bobolith.log.RateLimitFilter',
+            'period': 10.0,
+            'burst': 5,
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
+        # Writes to the console from a background thread, so logging never blocks consumers.
+        'background': {
+            'class': 'chezbob.bobolith.log.BackgroundHandler',
+            'target': 'logging.StreamHandler',
+            'formatter': 'kv',
+            'filters': ['appliance_rate_limit'],
+        },
     },
     'loggers': {
-        'chezbob.appliances.consumers': {
-            'handlers': ['console'],
+        'chezbob.appliances': {
+            'handlers': ['background'],
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
         },
     },
@@ -0,0 +1,44 @@
+import uuid
+
+from django.test import TestCase
+from django.urls import reverse
+
+from chezbob.accounts.models import User
+from chezbob.appliances.models import Appliance, ApplianceLink
+
+FLEET_SIZE = 10000
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+
+
+class ChangelistQueryTests(TestCase):
+    """
+    The appliance and appliance link changelists run a fixed number of
+    queries, however large the fleet.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        appliances = [Appliance(uuid=uuid.uuid4(), name=f'appliance-{i}', consumer=CONSUMER)
+                      for i in range(FLEET_SIZE)]
+        Appliance.objects.bulk_create(appliances)
+        ApplianceLink.objects.bulk_create(
+            [ApplianceLink(key='key', src_appliance=src, dst_appliance=dst)
+             for src, dst in zip(appliances, appliances[1:] + appliances[:1])])
+        cls.admin_user = User.objects.create_superuser('admin', '', None)
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def assertChangelistQueries(self, num, url):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_appliance_changelist(self):
+        self.assertChangelistQueries(4, reverse('admin:appliances_appliance_changelist'))
+
+    def test_appliance_changelist_filtered(self):
+        self.assertChangelistQueries(4, reverse('admin:appliances_appliance_changelist') + '?status__exact=UP')
+
+    def test_link_changelist(self):
+        self.assertChangelistQueries(4, reverse('admin:appliances_appliancelink_changelist'))
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import uuid
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from chezbob.appliances.models import Appliance, ApplianceLink
+from chezbob.appliances.provisioning import ProvisioningError, import_appliances
+
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+
+
+class ApplianceImportExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write(self, name, text):
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        return self.path(name)
+
+    def create_fleet(self):
+        appliances = [Appliance.objects.create(uuid=uuid.uuid4(), name=f'appliance-{i}', consumer=CONSUMER)
+                      for i in range(5)]
+        for src, dst in zip(appliances, appliances[1:]):
+            ApplianceLink.objects.create(src_appliance=src, dst_appliance=dst, key='door')
+        return appliances
+
+    def snapshot(self):
+        return (set(Appliance.objects.values_list('uuid', 'name', 'consumer')),
+                set(ApplianceLink.objects.values_list('src_appliance_id', 'dst_appliance_id', 'key')))
+
+    def test_round_trip(self):
+        self.create_fleet()
+        expected = self.snapshot()
+
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(format=fmt):
+                appliances, links = self.path(f'appliances.{fmt}'), self.path(f'links.{fmt}')
+                call_command('export_appliances', output=appliances)
+                call_command('export_appliances', output=links, links=True)
+
+                ApplianceLink.objects.all().delete()
+                Appliance.objects.all().delete()
+                call_command('import_appliances', appliances, links=links, stdout=StringIO())
+                self.assertEqual(self.snapshot(), expected)
+
+    def test_import_updates_existing_appliances(self):
+        [appliance, *_] = self.create_fleet()
+        path = self.write('appliances.jsonl',
+                          f'{{"uuid": "{appliance.uuid}", "name": "renamed", "consumer": "{CONSUMER}"}}\n'
+                          f'{{"name": "appliance-1", "consumer": "{CONSUMER}"}}\n'
+                          f'{{"name": "new", "consumer": "{CONSUMER}"}}\n')
+        links = self.write('links.csv', f'src,dst,key\n{appliance.uuid},{appliance.uuid},self\n')
+
+        call_command('import_appliances', path, links=links, stdout=StringIO())
+        appliance.refresh_from_db()
+        self.assertEqual(appliance.name, 'renamed')
+        self.assertEqual(Appliance.objects.filter(name='appliance-1').count(), 1)
+        self.assertEqual(Appliance.objects.count(), 6)
+        self.assertTrue(ApplianceLink.objects.filter(src_appliance=appliance, key='self').exists())
+
+    def test_existing_links_are_skipped(self):
+        self.create_fleet()
+        links = self.path('links.csv')
+        call_command('export_appliances', output=links, links=True)
+        call_command('import_appliances', links=links, stdout=StringIO())
+        self.assertEqual(ApplianceLink.objects.count(), 4)
+
+    def test_dry_run_rolls_back(self):
+        path = self.write('appliances.csv', f'uuid,name,consumer\n,new,{CONSUMER}\n')
+        call_command('import_appliances', path, dry_run=True, stdout=StringIO())
+        self.assertFalse(Appliance.objects.exists())
+
+    def test_invalid_records_are_rejected(self):
+        records = [
+            ({'name': 'x', 'consumer': 'no.such.Consumer'}, 'Record 1'),
+            ({'name': '', 'consumer': CONSUMER}, 'missing name'),
+            ({'uuid': 'nope', 'name': 'x', 'consumer': CONSUMER}, 'invalid appliance UUID'),
+        ]
+        for record, message in records:
+            with self.subTest(record=record), self.assertRaisesMessage(ProvisioningError, message):
+                import_appliances([record])
+        self.assertFalse(Appliance.objects.exists())
+
+    def test_links_to_unknown_appliances_are_rejected(self):
+        links = self.write('links.jsonl', f'{{"src": "{uuid.uuid4()}", "dst": "{uuid.uuid4()}", "key": "k"}}\n')
+        with self.assertRaisesMessage(CommandError, 'unknown appliances'):
+            call_command('import_appliances', links=links)
+
+    def test_invalid_json_is_rejected(self):
+        path = self.write('appliances.jsonl', '{"name": \n')
+        with self.assertRaisesMessage(CommandError, 'Line 1: invalid JSON'):
+            call_command('import_appliances', path)
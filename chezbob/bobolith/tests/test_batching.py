@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase
+from django.urls import path
+
+from chezbob.appliances.batching import OutboundCoalescer
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.protocol.codec import default_codec
+from chezbob.appliances.protocol.messages import BatchMessage, PingMessage, PongMessage
+from chezbob.bobolith.tests.utils import cancel_background_tasks
+
+
+class BatchingConsumer(ApplianceConsumer):
+    outbound_batch_max_messages = 10
+    outbound_batch_max_delay = 0.01
+
+
+class OutboundCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+    def test_full_buffer_is_sent_as_one_batch(self):
+        coalescer = OutboundCoalescer(self.send, max_messages=3, max_delay=60)
+
+        async def add():
+            for i in range(7):
+                await coalescer.add(i)
+
+        async_to_sync(add)()
+        self.assertEqual([batch.messages for batch in self.sent], [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(len(coalescer), 1)
+        coalescer.cancel()
+
+    def test_buffer_is_sent_after_the_delay(self):
+        coalescer = OutboundCoalescer(self.send, max_messages=3, max_delay=0.01)
+
+        async def add():
+            await coalescer.add('only')
+            self.assertEqual(self.sent, [])
+            await asyncio.sleep(0.05)
+
+        async_to_sync(add)()
+        # A lone message is sent as is, not as a batch of one.
+        self.assertEqual(self.sent, ['only'])
+
+    def test_cancel_drops_the_buffer(self):
+        coalescer = OutboundCoalescer(self.send, max_messages=3, max_delay=0.01)
+
+        async def add():
+            await coalescer.add(1)
+            coalescer.cancel()
+            await asyncio.sleep(0.05)
+
+        async_to_sync(add)()
+        self.assertEqual(self.sent, [])
+
+
+class BatchMessageTests(SimpleTestCase):
+    def talk(self, consumer_class, frames, replies):
+        application = URLRouter([path('ws/<uuid:appliance_uuid>/', consumer_class)])
+
+        async def talk():
+            communicator = WebsocketCommunicator(application, f'/ws/{uuid.uuid4()}/')
+            with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                await communicator.connect()
+            try:
+                for frame in frames:
+                    await communicator.send_to(text_data=default_codec.encode(frame))
+                received = [default_codec.decode(await communicator.receive_from()) for _ in range(replies)]
+                self.assertTrue(await communicator.receive_nothing())
+                return received
+            finally:
+                with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                    await communicator.disconnect()
+                await cancel_background_tasks()
+
+        return async_to_sync(talk)()
+
+    def test_incoming_batch_is_handled_in_order(self):
+        batch = BatchMessage(messages=[PingMessage(ping=str(i)) for i in range(3)])
+        replies = self.talk(ApplianceConsumer, [batch], 3)
+        self.assertTrue(all(isinstance(reply, PongMessage) for reply in replies))
+        self.assertEqual([reply.pong for reply in replies], ['0', '1', '2'])
+
+    def test_outbound_messages_are_coalesced(self):
+        [reply] = self.talk(BatchingConsumer, [PingMessage(ping=str(i)) for i in range(3)], 1)
+        self.assertIsInstance(reply, BatchMessage)
+        self.assertEqual([pong.pong for pong in reply.messages], ['0', '1', '2'])
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from chezbob.accounts.changes import ChangeFeed, UserChange, user_changes
+from chezbob.accounts.lookup import user_index
+from chezbob.accounts.models import User
+
+
+class ChangeFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.feed = ChangeFeed()
+        self.delivered = []
+        self.feed.subscribe(self.delivered.append)
+        self.user = User.objects.create_user('alice', password=None)
+
+    def change(self, fields, **kwargs):
+        return UserChange.from_user(self.user, fields, **kwargs)
+
+    def test_changes_outside_a_transaction_are_delivered_at_once(self):
+        self.feed.record(self.change({'nickname'}))
+        self.assertEqual(len(self.delivered), 1)
+
+    def test_changes_are_delivered_on_commit(self):
+        with transaction.atomic():
+            self.feed.record(self.change({'nickname'}))
+            self.assertEqual(self.delivered, [])
+        self.assertEqual(len(self.delivered), 1)
+
+        try:
+            with transaction.atomic():
+                self.feed.record(self.change({'barcode'}))
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(len(self.delivered), 1)
+
+    def test_batch_merges_changes_per_user(self):
+        with self.feed.batch():
+            self.feed.record(self.change(None, created=True))
+            self.user.nickname = 'Al'
+            self.feed.record(self.change({'nickname'}))
+            self.assertEqual(self.delivered, [])
+
+        [changes] = self.delivered
+        [change] = changes
+        self.assertTrue(change.created)
+        self.assertIsNone(change.fields)
+        self.assertEqual(change.values['nickname'], 'Al')
+
+    def test_merge_unions_fields(self):
+        change = self.change({'nickname'}).merge(self.change({'barcode'}))
+        self.assertEqual(change.fields, {'nickname', 'barcode'})
+        self.assertTrue(change.affects(['barcode']))
+        self.assertFalse(change.affects(['email']))
+        self.assertTrue(self.change({'nickname'}).merge(self.change(None, deleted=True)).deleted)
+
+    def test_nested_batches_are_delivered_by_the_outer_batch(self):
+        with self.feed.batch():
+            with self.feed.batch():
+                self.feed.record(self.change({'nickname'}))
+            self.assertEqual(self.delivered, [])
+        self.assertEqual(len(self.delivered), 1)
+
+    def test_begin_delivers_an_unflushed_batch(self):
+        self.feed.begin()
+        self.feed.record(self.change({'nickname'}))
+        self.feed.begin()
+        self.assertEqual(len(self.delivered), 1)
+        self.feed.flush()
+        self.assertEqual(len(self.delivered), 1)
+
+    def test_failing_subscriber_does_not_stop_delivery(self):
+        def fail(changes):
+            raise RuntimeError
+
+        feed = ChangeFeed()
+        feed.subscribe(fail)
+        feed.subscribe(self.delivered.append)
+        with self.assertLogs('chezbob.accounts.changes', 'ERROR'):
+            feed.record_many([self.change({'nickname'})])
+        self.assertEqual(len(self.delivered), 1)
+
+
+class UserSignalTests(TransactionTestCase):
+    def setUp(self):
+        self.delivered = []
+        user_changes.subscribe(self.delivered.append)
+        self.addCleanup(user_changes._subscribers.remove, self.delivered.append)
+
+    def test_saving_and_deleting_users_records_changes(self):
+        user = User.objects.create_user('alice', password=None)
+        user.nickname = 'Al'
+        user.save(update_fields=['nickname'])
+        pk = user.pk
+        user.delete()
+
+        changes = [change for batch in self.delivered for change in batch]
+        self.assertEqual([(change.pk, change.fields, change.created, change.deleted) for change in changes], [
+            (pk, None, True, False),
+            (pk, {'nickname'}, False, False),
+            (pk, None, False, True),
+        ])
+
+    def test_user_index_follows_changes(self):
+        user_index.load()
+        self.addCleanup(user_index.invalidate)
+        user = User.objects.create_user('alice', password=None)
+        self.assertEqual([entry.pk for entry in user_index.lookup('alice')], [user.pk])
+
+        user.nickname = 'Al'
+        user.save(update_fields=['nickname'])
+        self.assertEqual([entry.pk for entry in user_index.lookup('al')], [user.pk])
+        self.assertTrue(user_index.is_fresh())
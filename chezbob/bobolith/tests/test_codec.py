@@ -0,0 +1,139 @@
+import json
+import uuid
+from unittest import skipIf
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase
+from django.urls import path
+
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.protocol.codec import (MessageCodec, MsgpackCodec, decode_content, default_codec, msgpack,
+                                               negotiate)
+from chezbob.appliances.protocol.messages import (BatchMessage, MessageDecoder, MessageEncoder, PingMessage,
+                                                  PongMessage)
+from chezbob.bobolith.tests.utils import cancel_background_tasks
+
+
+def same_message(a, b):
+    """Whether two decoded messages (or plain values) are equal, field by field."""
+    if type(a) is not type(b):
+        return False
+    if not hasattr(type(a), 'msg_type'):
+        return a == b
+    if (a.header.msg_type, a.header.version) != (b.header.msg_type, b.header.version):
+        return False
+    slots = [slot for slot in type(a).__slots__ if slot != 'header']
+    for slot in slots:
+        if hasattr(a, slot) != hasattr(b, slot):
+            return False
+        if slot == 'messages':
+            if len(a.messages) != len(b.messages) or \
+                    not all(same_message(x, y) for x, y in zip(a.messages, b.messages)):
+                return False
+        elif getattr(a, slot, None) != getattr(b, slot, None):
+            return False
+    return True
+
+
+class MessageCodecTests(SimpleTestCase):
+    codecs = {'orjson': MessageCodec(use_orjson=True), 'json': MessageCodec(use_orjson=False)}
+
+    messages = [
+        PingMessage(ping='1571234567.89'),
+        PongMessage(pong='ünïcödé'),
+        PingMessage(),
+        BatchMessage(messages=[PingMessage(ping='a'), PongMessage(pong='b'), {'not': 'a message'}]),
+    ]
+
+    def test_encoding_matches_message_encoder(self):
+        for name, codec in self.codecs.items():
+            for msg in self.messages:
+                with self.subTest(codec=name, msg_type=msg.header.msg_type):
+                    self.assertEqual(json.loads(codec.encode(msg)), json.loads(MessageEncoder.encode(msg)))
+                    self.assertEqual(json.loads(codec.encode_bytes(msg)), json.loads(MessageEncoder.encode(msg)))
+
+    def test_decoding_matches_message_decoder(self):
+        for name, codec in self.codecs.items():
+            for msg in self.messages:
+                text = MessageEncoder.encode(msg)
+                with self.subTest(codec=name, msg_type=msg.header.msg_type):
+                    self.assertTrue(same_message(codec.decode(text), MessageDecoder.decode(text)))
+                    self.assertTrue(same_message(codec.decode(text.encode('utf-8')), MessageDecoder.decode(text)))
+
+    def test_round_trip(self):
+        for name, codec in self.codecs.items():
+            for msg in self.messages:
+                with self.subTest(codec=name, msg_type=msg.header.msg_type):
+                    self.assertTrue(same_message(codec.decode(codec.encode(msg)), msg))
+
+    def test_missing_fields_are_left_unset(self):
+        decoded = self.codecs['orjson'].decode('{"header": {"msg_type": "ping", "version": 0}}')
+        self.assertIsInstance(decoded, PingMessage)
+        self.assertFalse(hasattr(decoded, 'ping'))
+
+    def test_non_messages_are_returned_unchanged(self):
+        for content in ({'header': 'nope'}, {'header': {'msg_type': 'unknown'}}, {'ping': '1'}, [1, 2], 'text'):
+            with self.subTest(content=content):
+                self.assertEqual(decode_content(content), content)
+
+    def test_unaccepted_types_are_not_decoded(self):
+        codec = self.codecs['orjson']
+        text = codec.encode(PongMessage(pong='1'))
+        decoded = codec.decode(text, accept=frozenset({'ping'}))
+        self.assertEqual(decoded, {'header': {'msg_type': 'pong', 'version': 0}, 'pong': '1'})
+        self.assertIsInstance(codec.decode(text, accept=frozenset({'pong'})), PongMessage)
+
+    def test_unserializable_objects_are_rejected(self):
+        for name, codec in self.codecs.items():
+            with self.subTest(codec=name), self.assertRaises(TypeError):
+                codec.encode(PingMessage(ping=object()))
+
+
+@skipIf(msgpack is None, "msgpack is not installed.")
+class MsgpackTests(SimpleTestCase):
+    def test_negotiate_picks_the_first_supported_subprotocol(self):
+        subprotocol, codec = negotiate(['bobolith.cbor', 'bobolith.msgpack', 'bobolith.json'])
+        self.assertEqual(subprotocol, 'bobolith.msgpack')
+        self.assertIsInstance(codec, MsgpackCodec)
+        self.assertEqual(negotiate(['bobolith.json', 'bobolith.msgpack']), ('bobolith.json', default_codec))
+
+    def test_negotiate_falls_back_to_json(self):
+        self.assertEqual(negotiate([]), (None, default_codec))
+        self.assertEqual(negotiate(['chat']), (None, default_codec))
+
+    def test_round_trip(self):
+        codec = MsgpackCodec()
+        msg = BatchMessage(messages=[PingMessage(ping='a'), PongMessage(pong='b')])
+        data = codec.encode_bytes(msg)
+        self.assertEqual(msgpack.unpackb(data, raw=False), json.loads(MessageEncoder.encode(msg)))
+        self.assertTrue(same_message(codec.decode(data), msg))
+        self.assertEqual(codec.decode(data, accept=frozenset({'ping'}))['header']['msg_type'], 'batch')
+
+    def test_frames_are_binary_only(self):
+        with self.assertRaises(TypeError):
+            MsgpackCodec().encode(PingMessage(ping='a'))
+
+    def test_consumer_speaks_the_negotiated_codec(self):
+        application = URLRouter([path('ws/<uuid:appliance_uuid>/', ApplianceConsumer)])
+        codec = MsgpackCodec()
+
+        async def talk():
+            communicator = WebsocketCommunicator(application, f'/ws/{uuid.uuid4()}/',
+                                                 subprotocols=['bobolith.msgpack', 'bobolith.json'])
+            with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual(subprotocol, 'bobolith.msgpack')
+            try:
+                await communicator.send_to(bytes_data=codec.encode_bytes(PingMessage(ping='1')))
+                pong = codec.decode(await communicator.receive_from())
+                self.assertIsInstance(pong, PongMessage)
+                self.assertEqual(pong.pong, '1')
+            finally:
+                with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                    await communicator.disconnect()
+                await cancel_background_tasks()
+
+        async_to_sync(talk)()
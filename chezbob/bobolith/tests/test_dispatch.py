@@ -0,0 +1,64 @@
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.dispatch import handles
+from chezbob.appliances.protocol.codec import default_codec
+from chezbob.appliances.protocol.messages import BatchMessage, PingMessage, PongMessage
+
+
+class PingOnlyConsumer(ApplianceConsumer):
+    receive_pong = None
+    receive_batch = None
+
+
+class DecoratedConsumer(ApplianceConsumer):
+    @handles(PingMessage, PongMessage)
+    async def receive_either(self, msg):
+        pass
+
+
+class OverridingConsumer(DecoratedConsumer):
+    @handles(PongMessage)
+    async def receive_just_pongs(self, msg):
+        pass
+
+
+class DispatchTableTests(SimpleTestCase):
+    def test_handlers_by_convention(self):
+        self.assertEqual(ApplianceConsumer.message_handlers, {
+            PingMessage: ApplianceConsumer.receive_ping,
+            PongMessage: ApplianceConsumer.receive_pong,
+            BatchMessage: ApplianceConsumer.receive_batch,
+        })
+        self.assertEqual(ApplianceConsumer.accepted_msg_types, {'ping', 'pong', 'batch'})
+
+    def test_handlers_can_be_removed(self):
+        self.assertEqual(PingOnlyConsumer.message_handlers, {PingMessage: ApplianceConsumer.receive_ping})
+        self.assertEqual(PingOnlyConsumer.accepted_msg_types, {'ping'})
+
+    def test_decorated_handlers_take_precedence(self):
+        self.assertIs(DecoratedConsumer.message_handlers[PingMessage], DecoratedConsumer.receive_either)
+        self.assertIs(DecoratedConsumer.message_handlers[PongMessage], DecoratedConsumer.receive_either)
+        self.assertIs(DecoratedConsumer.message_handlers[BatchMessage], ApplianceConsumer.receive_batch)
+
+    def test_subclasses_override_their_bases(self):
+        self.assertIs(OverridingConsumer.message_handlers[PingMessage], DecoratedConsumer.receive_either)
+        self.assertIs(OverridingConsumer.message_handlers[PongMessage], OverridingConsumer.receive_just_pongs)
+
+
+class UnacceptedMessageTests(SimpleTestCase):
+    def test_unaccepted_types_are_not_decoded(self):
+        text = default_codec.encode(PongMessage(pong='1'))
+        self.assertIsInstance(async_to_sync(ApplianceConsumer.decode_json)(text), PongMessage)
+        self.assertEqual(async_to_sync(PingOnlyConsumer.decode_json)(text),
+                         {'header': {'msg_type': 'pong', 'version': 0}, 'pong': '1'})
+
+    def test_unaccepted_types_are_not_handled(self):
+        consumer = PingOnlyConsumer.__new__(PingOnlyConsumer)
+        consumer.log_extra = {}
+        content = async_to_sync(PingOnlyConsumer.decode_json)(default_codec.encode(PongMessage(pong='1')))
+
+        with self.assertLogs('chezbob.appliances.consumers', 'DEBUG') as logs:
+            async_to_sync(consumer.receive_json)(content)
+        self.assertIn('Ignoring unhandled message', logs.output[0])
@@ -0,0 +1,114 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from chezbob.appliances.heartbeat import HeartbeatScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Consumer:
+    """Records what the scheduler does to it."""
+
+    def __init__(self):
+        self.log_extra = {}
+        self.events = []
+
+    async def send_ping(self):
+        self.events.append('ping')
+
+    async def close(self):
+        self.events.append('close')
+
+    def status_responsive(self):
+        self.events.append('responsive')
+
+    def status_unresponsive(self):
+        self.events.append('unresponsive')
+
+    def status_down(self):
+        self.events.append('down')
+
+
+class HeartbeatSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+        self.clock = Clock()
+        patcher = mock.patch('chezbob.appliances.heartbeat.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.scheduler = HeartbeatScheduler(tick=1.0, ping_interval=10.0, unresponsive_timeout=30.0,
+                                            down_timeout=90.0)
+        self.addCleanup(self.stop)
+        self.consumer = Consumer()
+        self.scheduler.register(self.consumer)
+
+    def stop(self):
+        self.scheduler._task.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def advance(self, seconds):
+        """Move the clock on, process the ticks due, and run the pings and closes they started."""
+        self.clock.now += seconds
+        examined = self.scheduler.advance()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        return examined
+
+    def test_deadlines_must_be_ordered(self):
+        with self.assertRaises(ValueError):
+            HeartbeatScheduler(ping_interval=30.0, unresponsive_timeout=10.0, down_timeout=90.0)
+
+    def test_quiet_appliance_is_pinged(self):
+        self.advance(9.5)
+        self.assertEqual(self.consumer.events, [])
+        self.advance(1)
+        self.assertEqual(self.consumer.events, ['ping'])
+
+    def test_appliance_that_is_heard_from_is_not_pinged(self):
+        for _ in range(10):
+            self.advance(5)
+            self.scheduler.seen(self.consumer)
+        self.assertEqual(self.consumer.events, [])
+
+    def test_silent_appliance_goes_unresponsive_then_down(self):
+        self.advance(30.5)
+        # Still pinged while unresponsive.
+        self.assertEqual(self.consumer.events, ['unresponsive', 'ping'])
+        self.assertEqual(len(self.scheduler), 1)
+
+        self.advance(60)
+        self.assertEqual(self.consumer.events[-2:], ['down', 'close'])
+        self.assertEqual(self.consumer.events.count('unresponsive'), 1)
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_unresponsive_appliance_that_is_heard_from_is_responsive(self):
+        self.advance(30.5)
+        self.scheduler.seen(self.consumer)
+        self.assertEqual(self.consumer.events[-1], 'responsive')
+
+        self.advance(60)
+        self.assertNotIn('down', self.consumer.events)
+
+    def test_unregistered_appliance_is_forgotten(self):
+        self.scheduler.unregister(self.consumer)
+        self.advance(100)
+        self.assertEqual(self.consumer.events, [])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_tick_only_examines_due_appliances(self):
+        for _ in range(1000):
+            self.scheduler.register(Consumer())
+        self.assertEqual(self.advance(5), 0)
+        self.assertEqual(self.advance(5.5), 1001)
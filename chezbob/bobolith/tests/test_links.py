@@ -0,0 +1,50 @@
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+
+from chezbob.appliances.links import LinkGraph, link_group
+from chezbob.appliances.models import Appliance, ApplianceLink
+
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+
+
+class LinkGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.src, cls.dst, cls.other = [Appliance.objects.create(uuid=uuid.uuid4(), name=name, consumer=CONSUMER)
+                                       for name in ('src', 'dst', 'other')]
+        ApplianceLink.objects.create(key='coins', src_appliance=cls.src, dst_appliance=cls.dst)
+        ApplianceLink.objects.create(key='bills', src_appliance=cls.src, dst_appliance=cls.dst)
+
+    def setUp(self):
+        self.graph = LinkGraph(ApplianceLink.objects.all())
+
+    def test_incoming(self):
+        self.assertEqual(self.graph.incoming(self.dst.uuid), {(self.src.uuid, 'coins'), (self.src.uuid, 'bills')})
+        self.assertEqual(self.graph.incoming(str(self.other.uuid)), frozenset())
+        self.assertEqual(self.graph.incoming_groups(self.dst.uuid),
+                         {link_group(self.src.uuid, 'coins'), link_group(self.src.uuid, 'bills')})
+
+    def test_cached_until_invalidated(self):
+        self.graph.incoming(self.dst.uuid)
+        self.assertTrue(self.graph.is_fresh())
+        with self.assertNumQueries(0):
+            self.graph.incoming(self.dst.uuid)
+
+        self.graph.invalidate()
+        self.assertFalse(self.graph.is_fresh())
+        with self.assertNumQueries(1):
+            self.graph.incoming(self.dst.uuid)
+
+    def test_invalidated_while_loading(self):
+        load = self.graph.load
+
+        def load_then_invalidate():
+            # An `ApplianceLink` signal, on another thread, right after the load.
+            incoming = load()
+            self.graph.invalidate()
+            return incoming
+
+        with mock.patch.object(self.graph, 'load', side_effect=load_then_invalidate):
+            self.assertEqual(len(self.graph.incoming(self.dst.uuid)), 2)
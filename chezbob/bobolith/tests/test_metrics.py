@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chezbob.accounts.models import User
+from chezbob.appliances.metrics import metrics
+
+
+@mock.patch.object(metrics, 'enabled', True)
+@override_settings(BOBOLITH_METRICS_TOKEN='s3cret')
+class MetricsViewTests(TestCase):
+    def test_anonymous_request_is_rejected(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="metrics"')
+
+    def test_wrong_token_is_rejected(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+
+    def test_non_staff_user_is_rejected(self):
+        self.client.force_login(User.objects.create_user('member', password=None))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def test_staff_user(self):
+        self.client.force_login(User.objects.create_user('staff', password=None, is_staff=True))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(BOBOLITH_METRICS_TOKEN='')
+    def test_no_token_configured(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 401)
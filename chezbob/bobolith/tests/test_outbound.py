@@ -0,0 +1,175 @@
+import asyncio
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase
+from django.urls import path
+
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.outbound import OutboundQueue, COALESCE, DISCONNECT
+from chezbob.appliances.protocol.messages import PingMessage, PongMessage
+from chezbob.bobolith.tests.utils import cancel_background_tasks
+
+
+class Recorder:
+    """Stands in for a connection: records the messages and probes sent to it."""
+
+    def __init__(self):
+        self.sent = []
+        self.probes = []
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+    async def probe(self, seq):
+        self.probes.append(seq)
+
+
+@async_to_sync
+async def run(coroutine):
+    return await coroutine
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.recorder = Recorder()
+
+    def queue(self, **kwargs):
+        return OutboundQueue(self.recorder.send, probe=self.recorder.probe, **kwargs)
+
+    def test_sends_in_order(self):
+        queue = self.queue()
+
+        async def send():
+            for i in range(5):
+                await queue.send(i)
+
+        run(send())
+        self.assertEqual(self.recorder.sent, [0, 1, 2, 3, 4])
+        self.assertEqual(queue.sent, 5)
+        self.assertEqual(len(queue), 0)
+
+    def test_paused_queue_drops_oldest(self):
+        queue = self.queue(maxsize=3)
+        queue.pause()
+
+        async def send():
+            for i in range(5):
+                await queue.send(i)
+
+        run(send())
+        self.assertEqual(self.recorder.sent, [])
+        self.assertEqual(list(queue._queue), [2, 3, 4])
+        self.assertEqual(queue.dropped, 2)
+
+        queue.paused = False
+        run(queue.flush())
+        self.assertEqual(self.recorder.sent, [2, 3, 4])
+
+    def test_coalesce_drops_the_oldest_message_of_the_same_type(self):
+        queue = self.queue(maxsize=3, policy=COALESCE)
+        queue.pause()
+        ping, pong_1, pong_2, pong_3 = (PingMessage(ping='a'), PongMessage(pong='1'),
+                                        PongMessage(pong='2'), PongMessage(pong='3'))
+        for msg in (ping, pong_1, pong_2, pong_3):
+            queue.put(msg)
+        self.assertEqual(list(queue._queue), [ping, pong_2, pong_3])
+        self.assertEqual(queue.dropped, 1)
+
+    def test_disconnect_drops_everything_and_calls_on_overflow(self):
+        overflows = []
+        queue = self.queue(maxsize=2, policy=DISCONNECT, on_overflow=lambda: overflows.append(True))
+        queue.pause()
+        with self.assertLogs('chezbob.appliances.outbound', 'WARNING'):
+            for i in range(4):
+                queue.put(i)
+        self.assertEqual(overflows, [True])
+        self.assertTrue(queue.overflowed)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.dropped, 4)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            self.queue(policy='block')
+
+    def test_window_needs_a_probe(self):
+        with self.assertRaises(ValueError):
+            OutboundQueue(self.recorder.send, window=10)
+
+    def test_window_is_off_by_default(self):
+        queue = self.queue()
+
+        async def send():
+            for i in range(500):
+                await queue.send(i)
+
+        run(send())
+        self.assertEqual(len(self.recorder.sent), 500)
+        self.assertEqual(self.recorder.probes, [])
+
+    def test_window_stops_sending_until_acknowledged(self):
+        queue = self.queue(window=10)
+
+        async def send():
+            for i in range(15):
+                await queue.send(i)
+            self.assertEqual(self.recorder.sent, list(range(10)))
+            self.assertEqual(self.recorder.probes, [5])
+            self.assertTrue(queue.stalled)
+
+            queue.acknowledge(5)
+            await asyncio.sleep(0)
+
+        run(send())
+        self.assertEqual(self.recorder.sent, list(range(15)))
+        self.assertEqual(queue.in_flight, 10)
+        self.assertEqual(self.recorder.probes, [5, 11])
+        queue.cancel()
+
+    def test_unanswered_probes_are_sent_again(self):
+        queue = self.queue(window=4, probe_interval=0.01)
+
+        async def send():
+            for i in range(6):
+                await queue.send(i)
+            await asyncio.sleep(0.05)
+            queue.cancel()
+
+        with self.assertLogs('chezbob.appliances.outbound', 'WARNING'):
+            run(send())
+        self.assertEqual(self.recorder.sent, list(range(4)))
+        self.assertGreater(len(self.recorder.probes), 2)
+        self.assertEqual(set(self.recorder.probes[1:]), {4})
+
+    def test_acknowledgement_beyond_what_was_sent(self):
+        queue = self.queue(window=4)
+        run(queue.send(0))
+        queue.acknowledge(100)
+        self.assertEqual(queue.acknowledged, 1)
+        self.assertEqual(queue.in_flight, 0)
+
+
+class NonAcknowledgingClientTests(SimpleTestCase):
+    """A client that never answers the server's pings, like the v0 clients."""
+
+    def test_client_is_answered_indefinitely(self):
+        application = URLRouter([path('ws/<uuid:appliance_uuid>/', ApplianceConsumer)])
+
+        async def talk():
+            communicator = WebsocketCommunicator(application, f'/ws/{uuid.uuid4()}/')
+            with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            try:
+                for i in range(150):
+                    await communicator.send_json_to(PingMessage(ping=str(i)).to_json())
+                    pong = await communicator.receive_json_from()
+                    self.assertEqual(pong['pong'], str(i))
+            finally:
+                with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+                    await communicator.disconnect()
+                await cancel_background_tasks()
+
+        async_to_sync(talk)()
@@ -0,0 +1,76 @@
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.test import TransactionTestCase, override_settings
+
+from chezbob.accounts.models import User
+from chezbob.appliances.models import Appliance
+from chezbob.bobolith.routing import application
+from chezbob.bobolith.tests.utils import cancel_background_tasks
+
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+
+
+@override_settings(ALLOWED_HOSTS=['chezbob.example.com'])
+class StatusFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.appliance = Appliance.objects.create(uuid=uuid.uuid4(), name='vending', consumer=CONSUMER)
+
+    def session_cookie(self, user):
+        self.client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={self.client.session.session_key}'
+
+    def connect(self, path, cookie=None, origin='https://chezbob.example.com'):
+        headers = []
+        if cookie is not None:
+            headers.append((b'cookie', cookie.encode()))
+        if origin is not None:
+            headers.append((b'origin', origin.encode()))
+
+        async def connect():
+            communicator = WebsocketCommunicator(application, path, headers=headers)
+            connected, _ = await communicator.connect()
+            first = await communicator.receive_json_from() if connected else None
+            await communicator.disconnect()
+            await cancel_background_tasks()
+            return connected, first
+
+        return async_to_sync(connect)()
+
+    def test_user_with_view_permission_gets_a_snapshot(self):
+        user = User.objects.create_user('viewer', password=None, is_staff=True)
+        user.user_permissions.add(Permission.objects.get(codename='view_appliance'))
+
+        connected, snapshot = self.connect('/appliances/status/', self.session_cookie(user))
+        self.assertTrue(connected)
+        self.assertEqual(snapshot['type'], 'snapshot')
+        self.assertEqual([appliance['uuid'] for appliance in snapshot['appliances']], [str(self.appliance.uuid)])
+
+    def test_staff_without_view_permission_is_denied(self):
+        user = User.objects.create_user('staff', password=None, is_staff=True)
+        connected, _ = self.connect('/appliances/status/', self.session_cookie(user))
+        self.assertFalse(connected)
+
+    def test_anonymous_user_is_denied(self):
+        connected, _ = self.connect('/appliances/status/')
+        self.assertFalse(connected)
+
+    def test_other_origin_is_denied(self):
+        user = User.objects.create_superuser('admin', '', None)
+        connected, _ = self.connect('/appliances/status/', self.session_cookie(user),
+                                    origin='https://evil.example.org')
+        self.assertFalse(connected)
+
+    def test_appliance_without_origin_connects(self):
+        async def connect():
+            communicator = WebsocketCommunicator(application, f'/appliances/ws/{self.appliance.uuid}/')
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            await cancel_background_tasks()
+            return connected
+
+        with self.assertLogs('chezbob.appliances.consumers', 'INFO'):
+            self.assertTrue(async_to_sync(connect)())
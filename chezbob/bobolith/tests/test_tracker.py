@@ -0,0 +1,96 @@
+import uuid
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+
+from chezbob.appliances.models import Appliance
+from chezbob.appliances.tracker import StatusTracker
+
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+
+
+class StatusTrackerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.appliances = [Appliance.objects.create(uuid=uuid.uuid4(), name=f'appliance-{i}', consumer=CONSUMER)
+                          for i in range(4)]
+
+    def setUp(self):
+        self.tracker = StatusTracker()
+
+    def status(self, appliance):
+        appliance.refresh_from_db()
+        return appliance.status
+
+    def test_changes_are_merged_per_appliance(self):
+        appliance = self.appliances[0]
+        self.tracker.up(appliance.uuid)
+        self.tracker.down(str(appliance.uuid))
+        self.assertEqual(self.tracker.pending_count, 1)
+
+        self.assertEqual(self.tracker.flush(), 1)
+        appliance.refresh_from_db()
+        self.assertEqual(appliance.status, Appliance.STATUS_DOWN)
+        self.assertIsNotNone(appliance.last_connected_at)
+        self.assertEqual(self.tracker.pending_count, 0)
+
+    def test_identical_changes_are_one_update(self):
+        for appliance in self.appliances:
+            self.tracker.down(appliance.uuid)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), len(self.appliances))
+        self.assertEqual(Appliance.objects.filter(status=Appliance.STATUS_DOWN).count(), len(self.appliances))
+
+    def test_changes_are_grouped_by_field(self):
+        # Heartbeats differ in time, so are bulk-updated; the DOWNs are one update.
+        for appliance in self.appliances[:2]:
+            self.tracker.heartbeat(appliance.uuid)
+        for appliance in self.appliances[2:]:
+            self.tracker.down(appliance.uuid)
+        with self.assertNumQueries(2):
+            self.tracker.flush()
+        self.assertEqual([self.status(appliance) for appliance in self.appliances],
+                         [Appliance.STATUS_UP, Appliance.STATUS_UP, Appliance.STATUS_DOWN, Appliance.STATUS_DOWN])
+
+    def test_nothing_pending(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tracker.flush(), 0)
+
+    def test_failed_write_is_requeued_without_clobbering_newer_changes(self):
+        appliance, other = self.appliances[:2]
+        self.tracker.up(appliance.uuid)
+        self.tracker.up(other.uuid)
+
+        def write(pending):
+            # Recorded while the flush is in progress.
+            self.tracker.down(appliance.uuid)
+            raise DatabaseError("connection lost")
+
+        with mock.patch.object(self.tracker, '_write', side_effect=write):
+            with self.assertRaises(DatabaseError):
+                self.tracker.flush()
+        self.assertEqual(self.tracker.pending_count, 2)
+
+        self.tracker.flush()
+        appliance.refresh_from_db()
+        self.assertEqual(appliance.status, Appliance.STATUS_DOWN)
+        self.assertIsNotNone(appliance.last_connected_at)
+        self.assertEqual(self.status(other), Appliance.STATUS_UP)
+
+    def test_heartbeat_restores_up_after_a_stale_down(self):
+        # The appliance drops on one worker and reconnects on another, whose UP is written first.
+        appliance = self.appliances[0]
+        old_worker, new_worker = self.tracker, StatusTracker()
+        old_worker.up(appliance.uuid)
+        old_worker.flush()
+
+        new_worker.up(appliance.uuid)
+        old_worker.down(appliance.uuid)
+        new_worker.flush()
+        old_worker.flush()
+        self.assertEqual(self.status(appliance), Appliance.STATUS_DOWN)
+
+        new_worker.heartbeat(appliance.uuid)
+        new_worker.flush()
+        self.assertEqual(self.status(appliance), Appliance.STATUS_UP)
@@ -0,0 +1,83 @@
+from django.test import TestCase
+
+from chezbob.accounts.changes import UserChange
+from chezbob.accounts.lookup import UserIndex
+from chezbob.accounts.models import User
+
+
+def usernames(entries):
+    return [entry.username for entry in entries]
+
+
+class UserIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user('alice', password=None, nickname='Al', barcode='0123456789')
+        cls.alicia = User.objects.create_user('alicia', password=None)
+        cls.albert = User.objects.create_user('albert', password=None, nickname='Bertie')
+        cls.robert = User.objects.create_user('robert', password=None, nickname='Bob')
+        cls.inactive = User.objects.create_user('alan', password=None, is_active=False)
+
+    def setUp(self):
+        self.index = UserIndex(User.objects.all())
+        self.index.load()
+
+    def test_lookup(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(usernames(self.index.lookup('ALICE')), ['alice'])
+            self.assertEqual(usernames(self.index.lookup(' al ')), ['alice'])
+            self.assertEqual(usernames(self.index.lookup('0123456789')), ['alice'])
+            self.assertEqual(self.index.lookup('ali'), [])
+
+    def test_inactive_users_are_not_indexed(self):
+        self.assertEqual(self.index.lookup('alan'), [])
+        self.assertEqual(len(self.index), 4)
+
+    def test_search_ranks_exact_then_prefix_then_similar(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(usernames(self.index.search('al')), ['alice', 'albert', 'alicia'])
+            self.assertEqual(usernames(self.index.search('alic')), ['alice', 'alicia'])
+            self.assertEqual(usernames(self.index.search('robrt')), ['robert'])
+            self.assertEqual(usernames(self.index.search('robrt', fuzzy=False)), [])
+
+    def test_search_limit(self):
+        self.assertEqual(len(self.index.search('al', limit=2)), 2)
+        self.assertEqual(self.index.search('   '), [])
+
+    def test_barcodes_are_not_searched_by_prefix(self):
+        self.assertEqual(self.index.search('0123', fuzzy=False), [])
+
+    def test_stale_index_is_reloaded(self):
+        self.index.invalidate()
+        self.assertFalse(self.index.is_fresh())
+        with self.assertNumQueries(1):
+            self.assertEqual(usernames(self.index.lookup('bob')), ['robert'])
+        self.assertTrue(self.index.is_fresh())
+
+    def test_apply_rename(self):
+        self.robert.nickname = 'Rob'
+        self.index.apply([UserChange.from_user(self.robert, fields={'nickname'})])
+        self.assertEqual(self.index.lookup('bob'), [])
+        self.assertEqual(usernames(self.index.lookup('rob')), ['robert'])
+        self.assertEqual(usernames(self.index.search('ro', fuzzy=False)), ['robert'])
+
+    def test_apply_create_deactivate_and_delete(self):
+        carol = User(pk=1000, username='carol', nickname='', barcode=None)
+        self.index.apply([UserChange.from_user(carol, created=True)])
+        self.assertEqual(usernames(self.index.lookup('carol')), ['carol'])
+
+        self.alicia.is_active = False
+        self.index.apply([UserChange.from_user(self.alicia, fields={'is_active'}),
+                          UserChange.from_user(self.albert, deleted=True)])
+        self.assertEqual(usernames(self.index.search('al')), ['alice'])
+
+    def test_apply_ignores_other_fields(self):
+        entry = self.index.lookup('alice')[0]
+        self.alice.username = 'not-reindexed'
+        self.index.apply([UserChange.from_user(self.alice, fields={'last_login'})])
+        self.assertEqual(self.index.lookup('alice'), [entry])
+
+    def test_apply_before_load_is_ignored(self):
+        index = UserIndex(User.objects.all())
+        index.apply([UserChange.from_user(self.alice, deleted=True)])
+        self.assertEqual(usernames(index.lookup('alice')), ['alice'])
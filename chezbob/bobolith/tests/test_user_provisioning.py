@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import uuid
+from io import StringIO
+
+from django.contrib.auth.models import Permission
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from chezbob.accounts.models import User
+from chezbob.appliances.models import Appliance
+from chezbob.appliances.provisioning import stream_records
+
+CONSUMER = 'chezbob.appliances.consumers.ApplianceConsumer'
+IMPORTED_FIELDS = ('username', 'email', 'first_name', 'last_name', 'nickname', 'barcode')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportExportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def import_users(self, path, **options):
+        call_command('import_users', path, workers=1, stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return set(User.objects.values_list(*IMPORTED_FIELDS))
+
+    def test_round_trip(self):
+        User.objects.create_user('alice', 'alice@example.com', None, first_name='Alice', nickname='Al',
+                                 barcode='0123456789')
+        User.objects.create_user('bob', '', None, last_name='Ünïcödé')
+        expected = self.snapshot()
+
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(format=fmt):
+                path = self.path(f'users.{fmt}')
+                call_command('export_users', output=path)
+                User.objects.all().delete()
+                self.import_users(path)
+                self.assertEqual(self.snapshot(), expected)
+                self.assertFalse(User.objects.get(username='alice').has_usable_password())
+
+    def test_passwords_are_hashed(self):
+        path = self.path('users.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'username': 'carol', 'password': 'correct horse battery staple'}) + '\n')
+        self.import_users(path)
+        self.assertTrue(User.objects.get(username='carol').check_password('correct horse battery staple'))
+
+    def test_existing_users(self):
+        User.objects.create_user('alice', password=None)
+        path = self.path('users.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('username,nickname\nalice,Al\nbob,\n')
+
+        with self.assertRaisesMessage(CommandError, 'Users already exist: alice.'):
+            self.import_users(path)
+        self.assertFalse(User.objects.filter(username='bob').exists())
+
+        self.import_users(path, skip_existing=True)
+        self.assertEqual(User.objects.get(username='alice').nickname, '')
+        self.assertTrue(User.objects.filter(username='bob').exists())
+
+    def test_invalid_records_are_rejected(self):
+        records = [
+            ('username,password\n,\n', 'missing username'),
+            ('username,password\nnot valid!,\n', 'invalid username'),
+            ('username,password\ndave,\ndave,\n', 'duplicate username'),
+            ('username,password\ndave,dave\n', 'password for'),
+        ]
+        path = self.path('users.csv')
+        for text, message in records:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            with self.subTest(records=text), self.assertRaisesMessage(CommandError, message):
+                self.import_users(path)
+        self.assertFalse(User.objects.exists())
+
+    def test_dry_run_rolls_back(self):
+        path = self.path('users.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('username\ndave\n')
+        self.import_users(path, dry_run=True)
+        self.assertFalse(User.objects.exists())
+
+    def test_export_to_stdout(self):
+        User.objects.create_user('alice', password=None)
+        stdout = StringIO()
+        call_command('export_users', format='jsonl', stdout=stdout)
+        [record] = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(record['username'], 'alice')
+        self.assertNotIn('password', record)
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password=None, is_staff=True)
+        cls.staff.user_permissions.add(Permission.objects.get(codename='view_user'),
+                                       Permission.objects.get(codename='view_appliance'))
+        for i in range(3):
+            User.objects.create_user(f'user-{i}', password=None)
+            Appliance.objects.create(uuid=uuid.uuid4(), name=f'appliance-{i}', consumer=CONSUMER)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_records_are_streamed_a_batch_at_a_time(self):
+        chunks = list(stream_records('csv', ('n',), ((i,) for i in range(5)), batch_size=2))
+        self.assertEqual(chunks, ['n\r\n0\r\n1\r\n', '2\r\n3\r\n', '4\r\n'])
+        self.assertEqual(list(stream_records('csv', ('n',), [])), ['n\r\n'])
+
+        chunks = list(stream_records('jsonl', ('n',), ((i,) for i in range(3)), batch_size=2))
+        self.assertEqual(chunks, ['{"n": 0}\n{"n": 1}\n', '{"n": 2}\n'])
+        self.assertEqual(list(stream_records('jsonl', ('n',), [])), [])
+
+    def test_export_users(self):
+        self.client.force_login(self.staff)
+        response, text = self.download(reverse('export-users'), format='jsonl')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="users.jsonl"')
+        usernames = [json.loads(line)['username'] for line in text.splitlines()]
+        self.assertEqual(usernames, ['staff', 'user-0', 'user-1', 'user-2'])
+
+    def test_export_appliances(self):
+        self.client.force_login(self.staff)
+        response, text = self.download(reverse('export-appliances'))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(text.splitlines()[0], 'uuid,name,consumer')
+        self.assertEqual(len(text.splitlines()), 4)
+
+    def test_unknown_format(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('export-users'), {'format': 'xml'}).status_code, 400)
+
+    def test_permission_required(self):
+        self.client.force_login(User.objects.get(username='user-0'))
+        self.assertEqual(self.client.get(reverse('export-users')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('export-appliances')).status_code, 403)
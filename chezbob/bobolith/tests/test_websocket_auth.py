@@ -0,0 +1,97 @@
+import uuid
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import SimpleTestCase
+
+from chezbob.accounts.changes import UserChange
+from chezbob.accounts.middleware import AuthMiddleware, SessionUserCache
+from chezbob.accounts.models import User
+from chezbob.appliances.cache import ConsumerClassCache
+from chezbob.appliances.consumers import ApplianceConsumer
+from chezbob.appliances.models import Appliance
+from chezbob.appliances.routing import ApplianceUUIDRouter, DeferredConsumer
+
+
+class Consumer:
+    """A stand-in consumer that records the user it ran with."""
+    needs_user = True
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.user = None
+
+    async def __call__(self, receive, send):
+        self.user = self.scope['user']._wrapped
+
+
+class AuthMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SessionUserCache()
+        self.user = User(pk=1, username='member')
+        patcher = mock.patch('chezbob.accounts.middleware.get_user', side_effect=self.get_user)
+        self.get_user_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def get_user(self, scope):
+        return self.user
+
+    def scope(self, session_key='s3ssion', **kwargs):
+        cookies = {settings.SESSION_COOKIE_NAME: session_key} if session_key else {}
+        return {'type': 'websocket', 'cookies': cookies, **kwargs}
+
+    def connect(self, inner, scope):
+        instance = AuthMiddleware(inner, cache=self.cache)(scope)
+        async_to_sync(instance)(None, None)
+        return instance
+
+    def test_appliance_consumer_skips_the_user(self):
+        appliance_uuid = uuid.uuid4()
+        scope = self.scope(url_route={'kwargs': {'appliance_uuid': appliance_uuid}})
+        instance = AuthMiddleware(ApplianceConsumer, cache=self.cache)(scope)
+        self.assertIsInstance(instance, ApplianceConsumer)
+        self.assertIsInstance(instance.scope['user']._wrapped, AnonymousUser)
+        self.get_user_mock.assert_not_called()
+
+    def test_router_cache_miss_skips_the_user(self):
+        router = ApplianceUUIDRouter(ConsumerClassCache(Appliance.objects.all()))
+        scope = self.scope(url_route={'kwargs': {'appliance_uuid': uuid.uuid4()}})
+        instance = AuthMiddleware(router, cache=self.cache)(scope)
+        self.assertIsInstance(instance, DeferredConsumer)
+        self.assertIsInstance(instance.scope['user']._wrapped, AnonymousUser)
+        self.get_user_mock.assert_not_called()
+
+    def test_user_is_resolved_and_cached(self):
+        self.connect(Consumer, self.scope())
+        self.connect(Consumer, self.scope())
+        self.assertEqual(self.get_user_mock.call_count, 1)
+        self.assertIs(self.cache.get('s3ssion'), self.user)
+
+    def test_resolved_user_is_given_to_the_consumer(self):
+        instances = []
+
+        def inner(scope):
+            instances.append(Consumer(scope))
+            return instances[-1]
+
+        self.connect(inner, self.scope())
+        self.assertIs(instances[0].user, self.user)
+
+    def test_no_session_is_anonymous(self):
+        instances = []
+
+        def inner(scope):
+            instances.append(Consumer(scope))
+            return instances[-1]
+
+        self.connect(inner, self.scope(session_key=None))
+        self.assertIsInstance(instances[0].user, AnonymousUser)
+        self.get_user_mock.assert_not_called()
+
+    def test_changed_user_is_resolved_again(self):
+        self.connect(Consumer, self.scope())
+        self.cache.apply([UserChange.from_user(self.user, fields={'is_active'})])
+        self.connect(Consumer, self.scope())
+        self.assertEqual(self.get_user_mock.call_count, 2)
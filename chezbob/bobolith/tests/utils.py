@@ -0,0 +1,12 @@
+import asyncio
+
+
+async def cancel_background_tasks():
+    """
+    Cancel the tasks that connecting appliances started on this event loop (status
+    flushes, heartbeat ticks), so that they aren't left pending when it closes.
+    """
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -16,10 +16,15 @@ Including another URLconf
 from django.conf import settings
 from django.urls import path, include
 
+from chezbob.accounts import views as accounts_views
+from chezbob.appliances import views as appliances_views
 from chezbob.bobolith import admin
 
 urlpatterns = [
-    path('admin/', admin.site.urls)
+    path('admin/', admin.site.urls),
+    path('metrics', appliances_views.metrics, name='metrics'),
+    path('export/users', accounts_views.export_users, name='export-users'),
+    path('export/appliances', appliances_views.export_appliances, name='export-appliances'),
 ]
 
 # if settings.DEBUG: